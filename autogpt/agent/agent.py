@@ -1,22 +1,29 @@
+import os
 import signal
 import sys
+from contextlib import nullcontext
 from datetime import datetime
+from functools import partial
 
 from colorama import Fore, Style
 
 from autogpt.app import execute_command, get_command
 from autogpt.config import Config
+from autogpt.json_utils.incremental import IncrementalJsonParser
 from autogpt.json_utils.json_fix_llm import fix_json_using_multiple_techniques
 from autogpt.json_utils.utilities import LLM_DEFAULT_RESPONSE_FORMAT, validate_json
 from autogpt.llm import chat_with_ai, create_chat_completion, create_chat_message
+from autogpt.llm.context_builder import ContextBuilder
+from autogpt.llm.message_history import MessageHistory
 from autogpt.llm.token_counter import count_string_tokens
 from autogpt.log_cycle.log_cycle import (
-    FULL_MESSAGE_HISTORY_FILE_NAME,
+    MESSAGE_HISTORY_SPILL_FILE_NAME,
     NEXT_ACTION_FILE_NAME,
     USER_INPUT_FILE_NAME,
     LogCycleHandler,
 )
 from autogpt.logs import logger, print_assistant_thoughts
+from autogpt.memory_management.summary_memory import SummaryMemory
 from autogpt.speech import say_text
 from autogpt.spinner import Spinner
 from autogpt.utils import clean_input
@@ -67,11 +74,15 @@ class Agent:
         cfg = Config()
         self.ai_name = ai_name
         self.memory = memory
-        self.summary_memory = (
+        self.summary_memory = SummaryMemory(
             "나는 창조되었습니다."  # Initial memory necessary to avoid hallucination
         )
-        self.last_memory_index = 0
+        # The messages with lower IDs were trimmed from the context and summarized
+        self.trimmed_until_id = 0
+        if not isinstance(full_message_history, MessageHistory):
+            full_message_history = MessageHistory(full_message_history)
         self.full_message_history = full_message_history
+        self.context_builder = ContextBuilder()
         self.next_action_count = next_action_count
         self.command_registry = command_registry
         self.config = config
@@ -82,6 +93,16 @@ class Agent:
         self.cycle_count = 0
         self.log_cycle_handler = LogCycleHandler()
 
+        # Only keep the end of a long history in memory, the start goes to the logs
+        if self.full_message_history.spill_path is None:
+            self.full_message_history.max_messages = cfg.message_history_max_messages
+            self.full_message_history.spill_path = os.path.join(
+                self.log_cycle_handler.get_outer_directory(
+                    self.ai_name, self.created_at
+                ),
+                MESSAGE_HISTORY_SPILL_FILE_NAME,
+            )
+
     def start_interaction_loop(self):
         # Interaction Loop
         cfg = Config()
@@ -108,12 +129,11 @@ class Agent:
             # Discontinue if continuous limit is reached
             self.cycle_count += 1
             self.log_cycle_handler.log_count_within_cycle = 0
-            self.log_cycle_handler.log_cycle(
+            self.log_cycle_handler.log_new_messages(
                 self.config.ai_name,
                 self.created_at,
                 self.cycle_count,
                 self.full_message_history,
-                FULL_MESSAGE_HISTORY_FILE_NAME,
             )
             if (
                 cfg.continuous_mode
@@ -125,7 +145,11 @@ class Agent:
                 )
                 break
             # Send message to AI, get response
-            with Spinner("생각... "):
+            # When streaming, the thoughts are printed as soon as they are received
+            reply_parser = (
+                IncrementalJsonParser() if cfg.stream_chat_completions else None
+            )
+            with nullcontext() if reply_parser else Spinner("생각... "):
                 assistant_reply = chat_with_ai(
                     self,
                     self.system_prompt,
@@ -133,6 +157,9 @@ class Agent:
                     self.full_message_history,
                     self.memory,
                     cfg.fast_token_limit,
+                    on_chunk=partial(self._print_streamed_reply, reply_parser)
+                    if reply_parser
+                    else None,
                 )  # TODO: This hardcodes the model to use GPT3.5. Make this an argument
 
             assistant_reply_json = fix_json_using_multiple_techniques(assistant_reply)
@@ -146,9 +173,10 @@ class Agent:
                 validate_json(assistant_reply_json, LLM_DEFAULT_RESPONSE_FORMAT)
                 # Get command name and arguments
                 try:
-                    print_assistant_thoughts(
-                        self.ai_name, assistant_reply_json, cfg.speak_mode
-                    )
+                    if not reply_parser or "thoughts" not in reply_parser.members:
+                        print_assistant_thoughts(
+                            self.ai_name, assistant_reply_json, cfg.speak_mode
+                        )
                     command_name, arguments = get_command(assistant_reply_json)
                     if cfg.speak_mode:
                         say_text(f"{command_name}을 실행하고 싶습니다.")
@@ -309,6 +337,20 @@ class Agent:
                     "시스템: ", Fore.YELLOW, "명령을 실행할 수 없습니다."
                 )
 
+    def _print_streamed_reply(self, reply_parser, chunk):
+        """Print the thoughts of the assistant as soon as they are received
+
+        Args:
+            reply_parser (IncrementalJsonParser): The parser of the streamed reply.
+            chunk (str): The part of the reply that was just received.
+        """
+        cfg = Config()
+        for key, value in reply_parser.feed(chunk):
+            if key == "thoughts" and isinstance(value, dict):
+                print_assistant_thoughts(
+                    self.ai_name, {"thoughts": value}, cfg.speak_mode
+                )
+
     def _resolve_pathlike_command_args(self, command_args):
         if "directory" in command_args and command_args["directory"] in {"", "/"}:
             command_args["directory"] = str(self.workspace.root)
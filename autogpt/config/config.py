@@ -45,10 +45,18 @@ class Config(metaclass=Singleton):
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
         self.embedding_tokenizer = os.getenv("EMBEDDING_TOKENIZER", "cl100k_base")
         self.embedding_token_limit = int(os.getenv("EMBEDDING_TOKEN_LIMIT", 8191))
+        self.embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", 100000))
+        self.response_cache_size = int(os.getenv("RESPONSE_CACHE_SIZE", 0))
+        self.response_cache_ttl = float(os.getenv("RESPONSE_CACHE_TTL", 604800))
+        self.use_rate_limiter = os.getenv("USE_RATE_LIMITER", "True") == "True"
+        self.stream_chat_completions = (
+            os.getenv("STREAM_CHAT_COMPLETIONS", "False") == "True"
+        )
         self.browse_chunk_max_length = int(os.getenv("BROWSE_CHUNK_MAX_LENGTH", 3000))
         self.browse_spacy_language_model = os.getenv(
             "BROWSE_SPACY_LANGUAGE_MODEL", "en_core_web_sm"
         )
+        self.browse_summary_workers = int(os.getenv("BROWSE_SUMMARY_WORKERS", 4))
 
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.temperature = float(os.getenv("TEMPERATURE", "0"))
@@ -139,6 +147,24 @@ class Config(metaclass=Singleton):
         # Note that indexes must be created on db 0 in redis, this is not configurable.
 
         self.memory_backend = os.getenv("MEMORY_BACKEND", "local")
+        self.wipe_local_memory_on_start = (
+            os.getenv("WIPE_LOCAL_MEMORY_ON_START", "True") == "True"
+        )
+        self.local_memory_ivf_lists = int(os.getenv("LOCAL_MEMORY_IVF_LISTS", 0))
+        self.local_memory_ivf_probes = int(os.getenv("LOCAL_MEMORY_IVF_PROBES", 8))
+        self.local_memory_dtype = os.getenv("LOCAL_MEMORY_DTYPE", "float32")
+        self.message_history_max_messages = int(
+            os.getenv("MESSAGE_HISTORY_MAX_MESSAGES", 1000)
+        )
+        self.summary_memory_min_tokens = int(
+            os.getenv("SUMMARY_MEMORY_MIN_TOKENS", 500)
+        )
+        self.summary_memory_background = (
+            os.getenv("SUMMARY_MEMORY_BACKGROUND", "False") == "True"
+        )
+        self.summary_memory_max_staleness = int(
+            os.getenv("SUMMARY_MEMORY_MAX_STALENESS", 2)
+        )
 
         self.plugins_dir = os.getenv("PLUGINS_DIR", "plugins")
         self.plugins: List[AutoGPTPluginTemplate] = []
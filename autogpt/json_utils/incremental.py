@@ -0,0 +1,84 @@
+"""Incremental parsing of a JSON object that arrives in chunks."""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class IncrementalJsonParser:
+    """
+    Parses the members of a JSON object while its text is still arriving.
+
+    The text is fed chunk by chunk. Each top-level member of the object is parsed as
+    soon as its value is complete, so that e.g. the thoughts of the assistant can be
+    shown before the rest of its reply has been received. Any text before the
+    opening brace of the object, such as a markdown code fence, is ignored.
+    """
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.members: Dict[str, Any] = {}
+        self.done = False
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # Start of the text of the member being read, None between members
+        self._member_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Adds a chunk of text to the object.
+
+        Args:
+            chunk (str): The next part of the JSON text.
+
+        Returns:
+            list: The (key, value) pairs of the members completed by this chunk.
+        """
+        self.text += chunk
+        completed = []
+        text = self.text
+        for position in range(self._position, len(text)):
+            if self.done:
+                break
+            char = text[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._member_start is None:
+                    self._member_start = position
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1:
+                    # An object or array value has just been closed
+                    completed += self._complete_member(position + 1)
+                elif self._depth == 0:
+                    completed += self._complete_member(position)
+                    self.done = True
+            elif char == "," and self._depth == 1:
+                completed += self._complete_member(position)
+        self._position = len(text)
+        return completed
+
+    def _complete_member(self, end: int) -> List[Tuple[str, Any]]:
+        if self._member_start is None:
+            return []
+        member_text = self.text[self._member_start : end]
+        self._member_start = None
+        try:
+            member = json.loads("{" + member_text + "}")
+        except json.JSONDecodeError:
+            return []
+        self.members.update(member)
+        return list(member.items())
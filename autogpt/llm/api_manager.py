@@ -1,25 +1,144 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+import time
+from typing import Callable
+
 import openai
 
 from autogpt.config import Config
-from autogpt.llm.modelsinfo import COSTS
+from autogpt.llm.async_session import use_shared_session
+from autogpt.llm.modelsinfo import COSTS, RATE_LIMITS
+from autogpt.llm.token_counter import count_message_tokens, count_string_tokens
 from autogpt.logs import logger
 from autogpt.singleton import Singleton
 
 
+class TokenBucket:
+    """
+    A budget that refills continuously up to its capacity over one minute.
+
+    Reservations may overdraw the budget, so that each caller is told to wait
+    until the budget has refilled enough for its own reservation, in order.
+    """
+
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = capacity_per_minute
+        self.refill_per_second = capacity_per_minute / 60
+        self.level = capacity_per_minute
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take an amount from the budget.
+
+        Args:
+        amount (float): The amount to take, capped at the capacity of the bucket.
+
+        Returns:
+        float: The number of seconds to wait before the amount is available.
+        """
+        now = time.monotonic()
+        self.level = min(
+            self.capacity,
+            self.level + (now - self.updated) * self.refill_per_second,
+        )
+        self.updated = now
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.refill_per_second)
+
+
+class RateLimiter:
+    """Spaces out the requests to a model to stay within its RPM and TPM limits."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve a request of the given number of tokens.
+
+        Returns:
+        float: The number of seconds to wait before sending the request.
+        """
+        with self.lock:
+            return max(self.requests.reserve(1), self.tokens.reserve(tokens))
+
+
+def estimate_tokens(texts, max_tokens: int | None = None) -> int:
+    """
+    Estimate the tokens that a request counts against the TPM limit, like the API
+    does: about four characters per token, plus the tokens it may generate.
+
+    Args:
+    texts (list): The texts of the request, or chunks of tokens.
+    max_tokens (int): The maximum number of tokens to generate.
+
+    Returns:
+    int: The estimated number of tokens.
+    """
+    tokens = sum(
+        len(text) if isinstance(text, (list, tuple)) else len(text) // 4 + 1
+        for text in texts
+    )
+    return tokens + (max_tokens or 0)
+
+
 class ApiManager(metaclass=Singleton):
     def __init__(self):
         self.total_prompt_tokens = 0
         self.total_completion_tokens = 0
         self.total_cost = 0
         self.total_budget = 0
+        self.response_cache_hits = 0
+        self.response_cache_misses = 0
+        self.rate_limiters = {}
+        self.rate_limiters_lock = threading.Lock()
 
     def reset(self):
         self.total_prompt_tokens = 0
         self.total_completion_tokens = 0
         self.total_cost = 0
         self.total_budget = 0.0
+        self.response_cache_hits = 0
+        self.response_cache_misses = 0
+
+    def reserve_request(self, model: str, tokens: int) -> float:
+        """
+        Reserve a request to a model within its rate limits.
+
+        Args:
+        model (str): The model the request is sent to.
+        tokens (int): The estimated number of tokens of the request.
+
+        Returns:
+        float: The number of seconds to wait before sending the request.
+        """
+        cfg = Config()
+        if not cfg.use_rate_limiter or model not in RATE_LIMITS:
+            return 0.0
+        with self.rate_limiters_lock:
+            if model not in self.rate_limiters:
+                self.rate_limiters[model] = RateLimiter(**RATE_LIMITS[model])
+            rate_limiter = self.rate_limiters[model]
+        return rate_limiter.reserve(tokens)
+
+    def wait_for_rate_limit(self, model: str, tokens: int) -> None:
+        """Block until a request of the given number of tokens can be sent."""
+        wait = self.reserve_request(model, tokens)
+        if wait > 0:
+            logger.debug(f"Waiting {wait:.2f} seconds for the {model} rate limit")
+            time.sleep(wait)
+
+    async def await_rate_limit(self, model: str, tokens: int) -> None:
+        """Wait, without blocking the event loop, until a request can be sent."""
+        wait = self.reserve_request(model, tokens)
+        if wait > 0:
+            logger.debug(f"Waiting {wait:.2f} seconds for the {model} rate limit")
+            await asyncio.sleep(wait)
 
     def create_chat_completion(
         self,
@@ -42,6 +161,10 @@ class ApiManager(metaclass=Singleton):
         cfg = Config()
         if temperature is None:
             temperature = cfg.temperature
+        self.wait_for_rate_limit(
+            model,
+            estimate_tokens([message["content"] for message in messages], max_tokens),
+        )
         if deployment_id is not None:
             response = openai.ChatCompletion.create(
                 deployment_id=deployment_id,
@@ -66,6 +189,101 @@ class ApiManager(metaclass=Singleton):
             self.update_cost(prompt_tokens, completion_tokens, model)
         return response
 
+    async def acreate_chat_completion(
+        self,
+        messages: list,  # type: ignore
+        model: str | None = None,
+        temperature: float = None,
+        max_tokens: int | None = None,
+        deployment_id=None,
+    ):
+        """
+        Create a chat completion without blocking the event loop and update the cost.
+        The request is sent through the HTTP session shared by the running event loop.
+        Args:
+        messages (list): The list of messages to send to the API.
+        model (str): The model to use for the API call.
+        temperature (float): The temperature to use for the API call.
+        max_tokens (int): The maximum number of tokens for the API call.
+        Returns:
+        str: The AI's response.
+        """
+        cfg = Config()
+        if temperature is None:
+            temperature = cfg.temperature
+        await self.await_rate_limit(
+            model,
+            estimate_tokens([message["content"] for message in messages], max_tokens),
+        )
+        kwargs = {} if deployment_id is None else {"deployment_id": deployment_id}
+        use_shared_session()
+        response = await openai.ChatCompletion.acreate(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            api_key=cfg.openai_api_key,
+            **kwargs,
+        )
+        if not hasattr(response, "error"):
+            logger.debug(f"Response: {response}")
+            prompt_tokens = response.usage.prompt_tokens
+            completion_tokens = response.usage.completion_tokens
+            self.update_cost(prompt_tokens, completion_tokens, model)
+        return response
+
+    def stream_chat_completion(
+        self,
+        messages: list,  # type: ignore
+        on_chunk: Callable[[str], None],
+        model: str | None = None,
+        temperature: float = None,
+        max_tokens: int | None = None,
+        deployment_id=None,
+    ) -> str:
+        """
+        Create a chat completion, receiving the response as it is generated, and
+        update the cost.
+        Args:
+        messages (list): The list of messages to send to the API.
+        on_chunk (Callable[[str], None]): Called with every part of the response.
+        model (str): The model to use for the API call.
+        temperature (float): The temperature to use for the API call.
+        max_tokens (int): The maximum number of tokens for the API call.
+        Returns:
+        str: The AI's response.
+        """
+        cfg = Config()
+        if temperature is None:
+            temperature = cfg.temperature
+        self.wait_for_rate_limit(
+            model,
+            estimate_tokens([message["content"] for message in messages], max_tokens),
+        )
+        kwargs = {} if deployment_id is None else {"deployment_id": deployment_id}
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            api_key=cfg.openai_api_key,
+            stream=True,
+            **kwargs,
+        )
+        chunks = []
+        for event in response:
+            chunk = event.choices[0].delta.get("content")
+            if chunk:
+                chunks.append(chunk)
+                on_chunk(chunk)
+        reply = "".join(chunks)
+
+        # Streamed responses do not report their usage, so it is counted here
+        prompt_tokens = count_message_tokens(messages, model)
+        completion_tokens = count_string_tokens(reply, model)
+        self.update_cost(prompt_tokens, completion_tokens, model)
+        return reply
+
     def update_cost(self, prompt_tokens, completion_tokens, model):
         """
         Update the total cost, prompt tokens, and completion tokens.
@@ -83,6 +301,18 @@ class ApiManager(metaclass=Singleton):
         ) / 1000
         logger.debug(f"Total running cost: ${self.total_cost:.3f}")
 
+    def update_response_cache_stats(self, hit):
+        """
+        Count a lookup in the chat completion response cache.
+
+        Args:
+        hit (bool): Whether a cached response was found.
+        """
+        if hit:
+            self.response_cache_hits += 1
+        else:
+            self.response_cache_misses += 1
+
     def set_total_budget(self, total_budget):
         """
         Sets the total user-defined budget for API calls.
@@ -127,3 +357,21 @@ class ApiManager(metaclass=Singleton):
         float: The total budget for API calls.
         """
         return self.total_budget
+
+    def get_response_cache_hits(self):
+        """
+        Get the number of chat completions answered from the response cache.
+
+        Returns:
+        int: The number of response cache hits.
+        """
+        return self.response_cache_hits
+
+    def get_response_cache_misses(self):
+        """
+        Get the number of chat completions that were not in the response cache.
+
+        Returns:
+        int: The number of response cache misses.
+        """
+        return self.response_cache_misses
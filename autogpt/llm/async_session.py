@@ -0,0 +1,44 @@
+"""Shared HTTP session for the asynchronous OpenAI API requests."""
+from __future__ import annotations
+
+import asyncio
+import weakref
+
+import aiohttp
+import openai
+
+# Maximum number of simultaneous connections to the API per event loop
+CONNECTION_LIMIT = 16
+
+# aiohttp sessions can only be used in the event loop they were created in
+_sessions: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, aiohttp.ClientSession
+] = weakref.WeakKeyDictionary()
+
+
+def use_shared_session() -> aiohttp.ClientSession:
+    """
+    Make the OpenAI library send the requests of the current task through the
+    session shared by the running event loop, creating it if needed.
+
+    Without it, the library opens a new session, and new connections, per request.
+
+    Returns:
+        aiohttp.ClientSession: The shared session.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=CONNECTION_LIMIT)
+        )
+        _sessions[loop] = session
+    openai.aiosession.set(session)
+    return session
+
+
+async def close_shared_session() -> None:
+    """Close the session shared by the running event loop, if there is one."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
@@ -55,7 +55,13 @@ def generate_context(prompt, relevant_memory, full_message_history, model):
 
 # TODO: Change debug from hardcode to argument
 def chat_with_ai(
-    agent, prompt, user_input, full_message_history, permanent_memory, token_limit
+    agent,
+    prompt,
+    user_input,
+    full_message_history,
+    permanent_memory,
+    token_limit,
+    on_chunk=None,
 ):
     """Interact with the OpenAI API, sending the prompt, user input, message history,
     and permanent memory."""
@@ -73,6 +79,8 @@ def chat_with_ai(
                 permanent_memory (Obj): The memory object containing the permanent
                   memory.
                 token_limit (int): The maximum number of tokens allowed in the API call.
+                on_chunk (Callable, optional): If given, the reply is streamed and
+                  this is called with every part of it as it arrives.
 
             Returns:
             str: The AI's response.
@@ -121,53 +129,35 @@ def chat_with_ai(
 
             current_tokens_used += 500  # Account for memory (appended later) TODO: The final memory may be less than 500 tokens
 
-            # Add Messages until the token limit is reached or there are no more messages to add.
-            while next_message_to_add_index >= 0:
-                # print (f"CURRENT TOKENS USED: {current_tokens_used}")
-                message_to_add = full_message_history[next_message_to_add_index]
-
-                tokens_to_add = count_message_tokens([message_to_add], model)
-                if current_tokens_used + tokens_to_add > send_token_limit:
-                    # save_memory_trimmed_from_context_window(
-                    #     full_message_history,
-                    #     next_message_to_add_index,
-                    #     permanent_memory,
-                    # )
-                    break
-
-                # Add the most recent message to the start of the current context,
-                #  after the two system prompts.
-                current_context.insert(
-                    insertion_index, full_message_history[next_message_to_add_index]
-                )
-
-                # Count the currently used tokens
-                current_tokens_used += tokens_to_add
-
-                # Move to the next most recent message in the full message history
-                next_message_to_add_index -= 1
+            # Add the most recent messages that fit within the token limit to the
+            #  start of the current context, after the two system prompts.
+            agent.context_builder.update(full_message_history, model)
+            first_message_index = agent.context_builder.first_fitting_message(
+                send_token_limit - current_tokens_used
+            )
+            current_context[insertion_index:insertion_index] = full_message_history[
+                first_message_index:
+            ]
+            current_tokens_used += agent.context_builder.tokens_since(
+                first_message_index
+            )
             from autogpt.memory_management.summary_memory import (
                 get_newly_trimmed_messages,
-                update_running_summary,
             )
 
             # Insert Memories
             if len(full_message_history) > 0:
                 (
                     newly_trimmed_messages,
-                    agent.last_memory_index,
+                    agent.trimmed_until_id,
                 ) = get_newly_trimmed_messages(
                     full_message_history=full_message_history,
-                    current_context=current_context,
-                    last_memory_index=agent.last_memory_index,
+                    first_context_index=first_message_index,
+                    trimmed_until_id=agent.trimmed_until_id,
                 )
 
-                agent.summary_memory = update_running_summary(
-                    agent,
-                    current_memory=agent.summary_memory,
-                    new_events=newly_trimmed_messages,
-                )
-                current_context.insert(insertion_index, agent.summary_memory)
+                agent.summary_memory.update(agent, newly_trimmed_messages)
+                current_context.insert(insertion_index, agent.summary_memory.message)
 
             api_manager = ApiManager()
             # inform the AI about its remaining budget (if it has one)
@@ -245,6 +235,7 @@ def chat_with_ai(
                 model=model,
                 messages=current_context,
                 max_tokens=tokens_remaining,
+                on_chunk=on_chunk,
             )
 
             # Update full message history
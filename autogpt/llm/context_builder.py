@@ -0,0 +1,94 @@
+"""Incremental selection of the recent messages that fit in the context window."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import List
+
+from autogpt.llm.base import Message
+from autogpt.llm.token_counter import count_message_tokens
+
+
+class ContextBuilder:
+    """
+    Keeps the cumulative token count of a message history, so that the most recent
+    messages fitting in a token budget can be found with a binary search.
+
+    The history is expected to only grow at its end. Messages appended since the
+    last call are counted when the history is next used. The old messages a
+    MessageHistory spilled from its start are removed from the count without
+    counting the other ones again. If the history was replaced or changed in any
+    other way, it is counted again from scratch.
+    """
+
+    def __init__(self) -> None:
+        self.model = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.history = None
+        self.first_id = 0
+        self.last = None
+        # cumulative_tokens[i] is the number of tokens of the first i messages
+        self.cumulative_tokens = [0]
+
+    def update(self, full_message_history: List[Message], model: str) -> None:
+        """
+        Counts the tokens of the messages appended to the history since the last call.
+
+        Args:
+            full_message_history (list): The list of all messages sent between the
+                user and the AI.
+            model (str): The name of the model to use for tokenization.
+        """
+        num_counted = len(self.cumulative_tokens) - 1
+        # Messages dropped from the start of a MessageHistory since the last call
+        first_id = getattr(full_message_history, "first_id", 0)
+        num_dropped = first_id - self.first_id
+        if (
+            full_message_history is self.history
+            and model == self.model
+            and 0 < num_dropped <= num_counted
+        ):
+            dropped_tokens = self.cumulative_tokens[num_dropped]
+            self.cumulative_tokens = [
+                tokens - dropped_tokens
+                for tokens in self.cumulative_tokens[num_dropped:]
+            ]
+            num_counted -= num_dropped
+        if (
+            model != self.model
+            or full_message_history is not self.history
+            or len(full_message_history) < num_counted
+            or (num_counted and full_message_history[num_counted - 1] is not self.last)
+        ):
+            self.reset()
+            self.model = model
+            self.history = full_message_history
+            num_counted = 0
+        self.first_id = first_id
+
+        for message in full_message_history[num_counted:]:
+            self.cumulative_tokens.append(
+                self.cumulative_tokens[-1] + count_message_tokens([message], model)
+            )
+        self.last = full_message_history[-1] if full_message_history else None
+
+    def first_fitting_message(self, token_budget: int) -> int:
+        """
+        Returns the index of the oldest message such that it and all the messages
+        after it fit in the token budget.
+
+        Args:
+            token_budget (int): The number of tokens available for the messages.
+
+        Returns:
+            int: The index of the oldest message that fits, or the length of the
+                history if not even the last message fits.
+        """
+        total_tokens = self.cumulative_tokens[-1]
+        index = bisect_left(self.cumulative_tokens, total_tokens - token_budget)
+        return min(index, len(self.cumulative_tokens) - 1)
+
+    def tokens_since(self, index: int) -> int:
+        """Returns the number of tokens of the messages from the given index on."""
+        return self.cumulative_tokens[-1] - self.cumulative_tokens[index]
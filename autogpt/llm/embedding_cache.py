@@ -0,0 +1,58 @@
+"""Persistent cache of embeddings, keyed by embedding model and text."""
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from autogpt.config import Config
+from autogpt.llm.sqlite_cache import SQLiteLRUCache
+
+EMBEDDING_CACHE_FILE = "embedding_cache.sqlite3"
+
+_cache: Optional[EmbeddingCache] = None
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """An SQLite table of embeddings that evicts the least recently used ones.
+
+    Embeddings are stored as float32 and looked up by the model and the SHA-256
+    hash of the embedded text, so the texts themselves are never written to the
+    cache.
+    """
+
+    table = "embeddings"
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        # Whitespace does not change the meaning of a text, so it is ignored here
+        return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Return the cached embedding of a text, or None if it is not cached."""
+        blob = super().get(f"{model}:{self.text_hash(text)}")
+        if blob is None:
+            return None
+        return np.frombuffer(blob, dtype=np.float32).tolist()
+
+    def put(self, model: str, text: str, embedding: List[float]) -> None:
+        """Cache the embedding of a text, evicting the least recently used ones."""
+        blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        super().put(f"{model}:{self.text_hash(text)}", blob)
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the embedding cache of the workspace, or None if it is disabled."""
+    global _cache
+    cfg = Config()
+    if cfg.embedding_cache_size <= 0 or cfg.workspace_path is None:
+        return None
+
+    _cache = EmbeddingCache.reopen(
+        _cache,
+        Path(cfg.workspace_path) / EMBEDDING_CACHE_FILE,
+        max_entries=cfg.embedding_cache_size,
+    )
+    return _cache
@@ -1,33 +1,64 @@
 from __future__ import annotations
 
+import asyncio
 import functools
 import time
 from itertools import islice
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 
 import numpy as np
 import openai
-import tiktoken
 from colorama import Fore, Style
-from openai.error import APIError, RateLimitError, Timeout
+from openai.error import OpenAIError, RateLimitError
 
 from autogpt.config import Config
-from autogpt.llm.api_manager import ApiManager
+from autogpt.llm.api_manager import ApiManager, estimate_tokens
+from autogpt.llm.async_session import use_shared_session
 from autogpt.llm.base import Message
+from autogpt.llm.embedding_cache import get_embedding_cache
+from autogpt.llm.response_cache import ResponseCache, get_response_cache, request_key
+from autogpt.llm.retry import (
+    Backoff,
+    CircuitBreaker,
+    CircuitOpenError,
+    get_retry_after,
+    is_retryable_server_error,
+    is_server_error,
+)
+from autogpt.llm.token_counter import get_encoding
 from autogpt.logs import logger
 
+# Maximum number of inputs and of tokens sent in a single embeddings request
+EMBEDDING_BATCH_SIZE = 2048
+EMBEDDING_BATCH_TOKENS = 100_000
+
+# Shared by all the requests to the API, so that an outage stops all of them
+api_circuit_breaker = CircuitBreaker()
+
 
 def retry_openai_api(
     num_retries: int = 10,
     backoff_base: float = 2.0,
     warn_user: bool = True,
+    max_backoff: float = 60.0,
+    max_total_wait: float = 300.0,
+    circuit_breaker: Optional[CircuitBreaker] = None,
 ):
     """Retry an OpenAI API call.
 
+    The delays between the attempts grow with decorrelated jitter from
+    backoff_base ** 2 up to max_backoff seconds, unless the error tells how long
+    to wait with a Retry-After header.
+
     Args:
         num_retries int: Number of retries. Defaults to 10.
         backoff_base float: Base for exponential backoff. Defaults to 2.
         warn_user bool: Whether to warn the user. Defaults to True.
+        max_backoff float: Longest delay between two attempts. Defaults to 60.
+        max_total_wait float: Longest time spent waiting for a single call, after
+            which the last error is raised. Defaults to 300.
+        circuit_breaker CircuitBreaker: The circuit breaker of the API, which stops
+            the retries once it opens. Defaults to a new one for the function.
     """
     retry_limit_msg = f"{Fore.RED}Error: " f"Reached rate limit, passing...{Fore.RESET}"
     api_key_error_msg = (
@@ -35,35 +66,83 @@ def retry_openai_api(
         f"{Fore.CYAN + Style.BRIGHT}PAID{Style.RESET_ALL} OpenAI API Account. You can "
         f"read more here: {Fore.CYAN}https://docs.agpt.co/setup/#getting-an-api-key{Fore.RESET}"
     )
-    backoff_msg = (
-        f"{Fore.RED}Error: API Bad gateway. Waiting {{backoff}} seconds...{Fore.RESET}"
-    )
+    backoff_msg = f"{Fore.RED}Error: API Bad gateway. Waiting {{backoff:.2f}} seconds...{Fore.RESET}"
+
+    num_attempts = num_retries + 1  # +1 for the first attempt
+
+    def _handle_error(error, attempt, backoff, breaker, user_warned):
+        """Raise the error if it cannot be retried, else return the delay before the
+        next attempt and whether the user was warned"""
+        if is_server_error(error):
+            breaker.record_failure()
+
+        if isinstance(error, RateLimitError):
+            if attempt == num_attempts:
+                raise error
+
+            logger.debug(retry_limit_msg)
+            if not user_warned:
+                logger.double_check(api_key_error_msg)
+                user_warned = True
+
+        elif (
+            not is_retryable_server_error(error)
+            or attempt == num_attempts
+            or breaker.is_open
+        ):
+            raise error
+
+        delay = backoff.next_delay(get_retry_after(error))
+        if delay is None:
+            raise error
+        logger.debug(backoff_msg.format(backoff=delay))
+        return delay, user_warned
 
     def _wrapper(func):
+        breaker = circuit_breaker if circuit_breaker is not None else CircuitBreaker()
+
+        def _new_backoff():
+            return Backoff(backoff_base**2, max_backoff, max_total_wait)
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def _async_wrapped(*args, **kwargs):
+                user_warned = not warn_user
+                backoff = _new_backoff()
+                for attempt in range(1, num_attempts + 1):
+                    breaker.check()
+                    try:
+                        result = await func(*args, **kwargs)
+                        breaker.record_success()
+                        return result
+
+                    except OpenAIError as error:
+                        delay, user_warned = _handle_error(
+                            error, attempt, backoff, breaker, user_warned
+                        )
+
+                    await asyncio.sleep(delay)
+
+            return _async_wrapped
+
         @functools.wraps(func)
         def _wrapped(*args, **kwargs):
             user_warned = not warn_user
-            num_attempts = num_retries + 1  # +1 for the first attempt
+            backoff = _new_backoff()
             for attempt in range(1, num_attempts + 1):
+                breaker.check()
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
+                    breaker.record_success()
+                    return result
 
-                except RateLimitError:
-                    if attempt == num_attempts:
-                        raise
+                except OpenAIError as error:
+                    delay, user_warned = _handle_error(
+                        error, attempt, backoff, breaker, user_warned
+                    )
 
-                    logger.debug(retry_limit_msg)
-                    if not user_warned:
-                        logger.double_check(api_key_error_msg)
-                        user_warned = True
-
-                except APIError as e:
-                    if (e.http_status != 502) or (attempt == num_attempts):
-                        raise
-
-                backoff = backoff_base ** (attempt + 2)
-                logger.debug(backoff_msg.format(backoff=backoff))
-                time.sleep(backoff)
+                time.sleep(delay)
 
         return _wrapped
 
@@ -107,12 +186,12 @@ def call_ai_function(
 
 
 # Overly simple abstraction until we create something better
-# simple retry mechanism when getting a rate error or a bad gateway
 def create_chat_completion(
     messages: List[Message],  # type: ignore
     model: Optional[str] = None,
     temperature: float = None,
     max_tokens: Optional[int] = None,
+    on_chunk: Optional[Callable[[str], None]] = None,
 ) -> str:
     """Create a chat completion using the OpenAI API
 
@@ -121,6 +200,9 @@ def create_chat_completion(
         model (str, optional): The model to use. Defaults to None.
         temperature (float, optional): The temperature to use. Defaults to 0.9.
         max_tokens (int, optional): The max tokens to use. Defaults to None.
+        on_chunk (Callable[[str], None], optional): If given, the response is
+            streamed and this is called with every part of it as it arrives.
+            Defaults to None.
 
     Returns:
         str: The response from the chat completion
@@ -130,66 +212,51 @@ def create_chat_completion(
         temperature = cfg.temperature
 
     num_retries = 10
-    warned_user = False
     logger.debug(
         f"{Fore.GREEN}Creating chat completion with model {model}, temperature {temperature}, max_tokens {max_tokens}{Fore.RESET}"
     )
-    for plugin in cfg.plugins:
-        if plugin.can_handle_chat_completion(
-            messages=messages,
+    message = handle_chat_completion_with_plugins(
+        messages, model, temperature, max_tokens
+    )
+    if message is not None:
+        if on_chunk is not None:
+            on_chunk(message)
+        return message
+    api_manager = ApiManager()
+
+    cache, key, resp = get_cached_chat_completion(
+        messages, model, temperature, max_tokens
+    )
+    if resp is not None:
+        if on_chunk is not None:
+            on_chunk(resp)
+        return apply_on_response_plugins(resp)
+
+    deployment_id = (
+        cfg.get_azure_deployment_id_for_model(model) if cfg.use_azure else None
+    )
+    kwargs = {}
+    if on_chunk is not None:
+        send_request = _stream_chat_completion_once
+        kwargs["on_chunk"] = on_chunk
+    else:
+        send_request = api_manager.create_chat_completion
+    response = None
+    try:
+        response = retry_openai_api(
+            num_retries=num_retries, circuit_breaker=api_circuit_breaker
+        )(send_request)(
             model=model,
+            messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
-        ):
-            message = plugin.handle_chat_completion(
-                messages=messages,
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-            if message is not None:
-                return message
-    api_manager = ApiManager()
-    response = None
-    for attempt in range(num_retries):
-        backoff = 2 ** (attempt + 2)
-        try:
-            if cfg.use_azure:
-                response = api_manager.create_chat_completion(
-                    deployment_id=cfg.get_azure_deployment_id_for_model(model),
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-            else:
-                response = api_manager.create_chat_completion(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-            break
-        except RateLimitError:
-            logger.debug(
-                f"{Fore.RED}Error: ", f"Reached rate limit, passing...{Fore.RESET}"
-            )
-            if not warned_user:
-                logger.double_check(
-                    f"Please double check that you have setup a {Fore.CYAN + Style.BRIGHT}PAID{Style.RESET_ALL} OpenAI API Account. "
-                    + f"You can read more here: {Fore.CYAN}https://docs.agpt.co/setup/#getting-an-api-key{Fore.RESET}"
-                )
-                warned_user = True
-        except (APIError, Timeout) as e:
-            if e.http_status != 502:
-                raise
-            if attempt == num_retries - 1:
-                raise
-        logger.debug(
-            f"{Fore.RED}Error: ",
-            f"API Bad gateway. Waiting {backoff} seconds...{Fore.RESET}",
+            deployment_id=deployment_id,
+            **kwargs,
         )
-        time.sleep(backoff)
+    except (RateLimitError, CircuitOpenError):
+        pass
+    except _InterruptedStreamError as error:
+        raise error.__cause__
     if response is None:
         logger.typewriter_log(
             "FAILED TO GET RESPONSE FROM OPENAI",
@@ -202,7 +269,149 @@ def create_chat_completion(
             raise RuntimeError(f"Failed to get response after {num_retries} retries")
         else:
             quit(1)
+    if on_chunk is not None:
+        resp = response
+    else:
+        resp = response.choices[0].message["content"]
+    if cache is not None:
+        cache.put(key, resp)
+    return apply_on_response_plugins(resp)
+
+
+class _InterruptedStreamError(Exception):
+    """Raised instead of an API error once a part of the stream was delivered, so
+    that the request is not retried."""
+
+
+def _stream_chat_completion_once(on_chunk: Callable[[str], None], **kwargs) -> str:
+    """Stream a chat completion, raising an _InterruptedStreamError if it fails after
+    some of its chunks were passed to on_chunk: sending the request again would
+    pass them a second time."""
+    delivered = False
+
+    def _on_chunk(chunk: str) -> None:
+        nonlocal delivered
+        delivered = True
+        on_chunk(chunk)
+
+    try:
+        return ApiManager().stream_chat_completion(on_chunk=_on_chunk, **kwargs)
+    except OpenAIError as error:
+        if delivered:
+            raise _InterruptedStreamError() from error
+        raise
+
+
+async def acreate_chat_completion(
+    messages: List[Message],  # type: ignore
+    model: Optional[str] = None,
+    temperature: float = None,
+    max_tokens: Optional[int] = None,
+) -> str:
+    """Create a chat completion using the OpenAI API, without blocking the event loop
+
+    The request is sent through the HTTP session shared by the running event loop,
+    so that concurrent requests reuse its connections.
+
+    Args:
+        messages (List[Message]): The messages to send to the chat completion
+        model (str, optional): The model to use. Defaults to None.
+        temperature (float, optional): The temperature to use. Defaults to 0.9.
+        max_tokens (int, optional): The max tokens to use. Defaults to None.
+
+    Returns:
+        str: The response from the chat completion
+    """
+    cfg = Config()
+    if temperature is None:
+        temperature = cfg.temperature
+
+    logger.debug(
+        f"{Fore.GREEN}Creating chat completion with model {model}, temperature {temperature}, max_tokens {max_tokens}{Fore.RESET}"
+    )
+    message = handle_chat_completion_with_plugins(
+        messages, model, temperature, max_tokens
+    )
+    if message is not None:
+        return message
+
+    cache, key, resp = get_cached_chat_completion(
+        messages, model, temperature, max_tokens
+    )
+    if resp is not None:
+        return apply_on_response_plugins(resp)
+
+    deployment_id = (
+        cfg.get_azure_deployment_id_for_model(model) if cfg.use_azure else None
+    )
+    response = await retry_openai_api(circuit_breaker=api_circuit_breaker)(
+        ApiManager().acreate_chat_completion
+    )(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        deployment_id=deployment_id,
+    )
     resp = response.choices[0].message["content"]
+    if cache is not None:
+        cache.put(key, resp)
+    return apply_on_response_plugins(resp)
+
+
+def handle_chat_completion_with_plugins(
+    messages: List[Message],  # type: ignore
+    model: Optional[str],
+    temperature: float,
+    max_tokens: Optional[int],
+) -> Optional[str]:
+    """Let the first plugin that handles chat completions reply, if there is one"""
+    cfg = Config()
+    for plugin in cfg.plugins:
+        if plugin.can_handle_chat_completion(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        ):
+            message = plugin.handle_chat_completion(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+            if message is not None:
+                return message
+    return None
+
+
+def get_cached_chat_completion(
+    messages: List[Message],  # type: ignore
+    model: Optional[str],
+    temperature: float,
+    max_tokens: Optional[int],
+) -> Tuple[Optional[ResponseCache], Optional[str], Optional[str]]:
+    """Look up a chat completion request in the response cache
+
+    Returns:
+        The cache to store the response in, or None if the request must not be
+        cached, the key of the request, and the cached response, if any.
+    """
+    # Only requests at temperature 0 are expected to get the same reply every time
+    cache = get_response_cache() if temperature == 0 else None
+    if cache is None:
+        return None, None, None
+    key = request_key(model, messages, temperature, max_tokens)
+    resp = cache.get(key)
+    ApiManager().update_response_cache_stats(hit=resp is not None)
+    if resp is not None:
+        logger.debug("Using cached chat completion response")
+    return cache, key, resp
+
+
+def apply_on_response_plugins(resp: str) -> str:
+    """Let the plugins that handle responses modify a chat completion response"""
+    cfg = Config()
     for plugin in cfg.plugins:
         if not plugin.can_handle_on_response():
             continue
@@ -221,7 +430,7 @@ def batched(iterable, n):
 
 
 def chunked_tokens(text, tokenizer_name, chunk_length):
-    tokenizer = tiktoken.get_encoding(tokenizer_name)
+    tokenizer = get_encoding(tokenizer_name)
     tokens = tokenizer.encode(text)
     chunks_iterator = batched(tokens, chunk_length)
     yield from chunks_iterator
@@ -249,7 +458,221 @@ def get_ada_embedding(text: str) -> List[float]:
     return embedding
 
 
-@retry_openai_api()
+def get_ada_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embeddings from the ada model for several texts.
+
+    Args:
+        texts (List[str]): The texts to embed.
+
+    Returns:
+        List[List[float]]: The embeddings, in the same order as the texts.
+    """
+    cfg = Config()
+    model = cfg.embedding_model
+    texts = [text.replace("\n", " ") for text in texts]
+
+    if cfg.use_azure:
+        kwargs = {"engine": cfg.get_azure_deployment_id_for_model(model)}
+    else:
+        kwargs = {"model": model}
+
+    return create_embeddings(texts, **kwargs)
+
+
+def pack_chunks(chunks, max_tokens, max_items):
+    """Group token chunks into batches within a token and an item limit.
+
+    Chunks are kept in order. A chunk longer than max_tokens gets a batch of its own.
+    """
+    # pack_chunks([(1, 2), (3,), (4, 5)], 3, 10) --> [(1, 2), (3,)] [(4, 5)]
+    batch = []
+    batch_tokens = 0
+    for chunk in chunks:
+        if batch and (
+            batch_tokens + len(chunk) > max_tokens or len(batch) == max_items
+        ):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(chunk)
+        batch_tokens += len(chunk)
+    if batch:
+        yield batch
+
+
+def create_embeddings(
+    texts: List[str],
+    *_,
+    **kwargs,
+) -> List[List[float]]:
+    """Create embeddings for several texts using as few OpenAI API requests as possible
+
+    Every text is split into chunks of at most the embedding token limit. The chunks
+    of all texts are sent together, up to EMBEDDING_BATCH_SIZE chunks and
+    EMBEDDING_BATCH_TOKENS tokens per request, and the embedding of a text is the
+    average of the embeddings of its chunks, weighted by their length.
+
+    Args:
+        texts (List[str]): The texts to embed.
+        kwargs: Other arguments to pass to the OpenAI API embedding creation call.
+
+    Returns:
+        List[List[float]]: The normalized embeddings, in the same order as the texts.
+    """
+    embeddings, chunks, chunk_owners = _get_cached_embeddings_and_chunks(texts)
+    chunk_embeddings = []
+    for batch in pack_chunks(chunks, EMBEDDING_BATCH_TOKENS, EMBEDDING_BATCH_SIZE):
+        chunk_embeddings.extend(create_embedding_batch(batch, **kwargs))
+    return _combine_chunk_embeddings(
+        texts, embeddings, chunks, chunk_owners, chunk_embeddings
+    )
+
+
+async def acreate_embeddings(
+    texts: List[str],
+    *_,
+    **kwargs,
+) -> List[List[float]]:
+    """Create embeddings for several texts, sending the requests concurrently
+
+    Works like create_embeddings, except that all the requests are sent at once
+    through the HTTP session shared by the running event loop.
+
+    Args:
+        texts (List[str]): The texts to embed.
+        kwargs: Other arguments to pass to the OpenAI API embedding creation call.
+
+    Returns:
+        List[List[float]]: The normalized embeddings, in the same order as the texts.
+    """
+    embeddings, chunks, chunk_owners = _get_cached_embeddings_and_chunks(texts)
+    batches = await asyncio.gather(
+        *(
+            acreate_embedding_batch(batch, **kwargs)
+            for batch in pack_chunks(
+                chunks, EMBEDDING_BATCH_TOKENS, EMBEDDING_BATCH_SIZE
+            )
+        )
+    )
+    chunk_embeddings = [embedding for batch in batches for embedding in batch]
+    return _combine_chunk_embeddings(
+        texts, embeddings, chunks, chunk_owners, chunk_embeddings
+    )
+
+
+def _get_cached_embeddings_and_chunks(texts):
+    """Return the cached embeddings of the texts, None for those that are not
+    cached, and the token chunks of the latter with the index of their text"""
+    cfg = Config()
+    cache = get_embedding_cache()
+    if cache is not None:
+        embeddings = [cache.get(cfg.embedding_model, text) for text in texts]
+    else:
+        embeddings = [None] * len(texts)
+
+    chunks = []
+    chunk_owners = []
+    for i, embedding in enumerate(embeddings):
+        if embedding is not None:
+            continue
+        for chunk in chunked_tokens(
+            texts[i],
+            tokenizer_name=cfg.embedding_tokenizer,
+            chunk_length=cfg.embedding_token_limit,
+        ):
+            chunks.append(chunk)
+            chunk_owners.append(i)
+    return embeddings, chunks, chunk_owners
+
+
+def _combine_chunk_embeddings(
+    texts, embeddings, chunks, chunk_owners, chunk_embeddings
+):
+    """Fill in the embeddings of the texts that were split into chunks"""
+    if not chunks:
+        return embeddings
+    cfg = Config()
+    cache = get_embedding_cache()
+    chunk_embeddings = np.array(chunk_embeddings)
+    chunk_lengths = np.array([len(chunk) for chunk in chunks])
+    chunk_owners = np.array(chunk_owners)
+
+    for i in np.unique(chunk_owners):
+        # do weighted avg
+        is_owned = chunk_owners == i
+        embedding = np.average(
+            chunk_embeddings[is_owned], axis=0, weights=chunk_lengths[is_owned]
+        )
+        embedding = embedding / np.linalg.norm(embedding)  # normalize the length to one
+        embeddings[i] = embedding.tolist()
+        if cache is not None:
+            cache.put(cfg.embedding_model, texts[i], embeddings[i])
+    return embeddings
+
+
+@retry_openai_api(circuit_breaker=api_circuit_breaker)
+def create_embedding_batch(
+    inputs: List,
+    *_,
+    **kwargs,
+) -> List[List[float]]:
+    """Create embeddings for several inputs with a single OpenAI API request
+
+    Args:
+        inputs (List): The texts or token chunks to embed, each within the token limit.
+        kwargs: Other arguments to pass to the OpenAI API embedding creation call.
+
+    Returns:
+        List[List[float]]: The embeddings, in the same order as the inputs.
+    """
+    cfg = Config()
+    ApiManager().wait_for_rate_limit(cfg.embedding_model, estimate_tokens(inputs))
+    embedding = openai.Embedding.create(
+        input=inputs,
+        api_key=cfg.openai_api_key,
+        **kwargs,
+    )
+    return _read_embedding_response(embedding)
+
+
+@retry_openai_api(circuit_breaker=api_circuit_breaker)
+async def acreate_embedding_batch(
+    inputs: List,
+    *_,
+    **kwargs,
+) -> List[List[float]]:
+    """Create embeddings for several inputs with a single asynchronous request
+
+    Args:
+        inputs (List): The texts or token chunks to embed, each within the token limit.
+        kwargs: Other arguments to pass to the OpenAI API embedding creation call.
+
+    Returns:
+        List[List[float]]: The embeddings, in the same order as the inputs.
+    """
+    cfg = Config()
+    await ApiManager().await_rate_limit(cfg.embedding_model, estimate_tokens(inputs))
+    use_shared_session()
+    embedding = await openai.Embedding.acreate(
+        input=inputs,
+        api_key=cfg.openai_api_key,
+        **kwargs,
+    )
+    return _read_embedding_response(embedding)
+
+
+def _read_embedding_response(embedding) -> List[List[float]]:
+    cfg = Config()
+    api_manager = ApiManager()
+    api_manager.update_cost(
+        prompt_tokens=embedding.usage.prompt_tokens,
+        completion_tokens=0,
+        model=cfg.embedding_model,
+    )
+    data = sorted(embedding["data"], key=lambda item: item["index"])
+    return [item["embedding"] for item in data]
+
+
 def create_embedding(
     text: str,
     *_,
@@ -264,32 +687,21 @@ def create_embedding(
     Returns:
         openai.Embedding: The embedding object.
     """
-    cfg = Config()
-    chunk_embeddings = []
-    chunk_lengths = []
-    for chunk in chunked_tokens(
-        text,
-        tokenizer_name=cfg.embedding_tokenizer,
-        chunk_length=cfg.embedding_token_limit,
-    ):
-        embedding = openai.Embedding.create(
-            input=[chunk],
-            api_key=cfg.openai_api_key,
-            **kwargs,
-        )
-        api_manager = ApiManager()
-        api_manager.update_cost(
-            prompt_tokens=embedding.usage.prompt_tokens,
-            completion_tokens=0,
-            model=cfg.embedding_model,
-        )
-        chunk_embeddings.append(embedding["data"][0]["embedding"])
-        chunk_lengths.append(len(chunk))
-
-    # do weighted avg
-    chunk_embeddings = np.average(chunk_embeddings, axis=0, weights=chunk_lengths)
-    chunk_embeddings = chunk_embeddings / np.linalg.norm(
-        chunk_embeddings
-    )  # normalize the length to one
-    chunk_embeddings = chunk_embeddings.tolist()
-    return chunk_embeddings
+    return create_embeddings([text], **kwargs)[0]
+
+
+async def acreate_embedding(
+    text: str,
+    *_,
+    **kwargs,
+) -> List[float]:
+    """Create an embedding using the OpenAI API, without blocking the event loop
+
+    Args:
+        text (str): The text to embed.
+        kwargs: Other arguments to pass to the OpenAI API embedding creation call.
+
+    Returns:
+        List[float]: The embedding.
+    """
+    return (await acreate_embeddings([text], **kwargs))[0]
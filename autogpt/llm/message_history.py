@@ -0,0 +1,134 @@
+"""Message history of an agent, with stable sequence IDs."""
+from __future__ import annotations
+
+import json
+import os
+from array import array
+from typing import Iterable, Iterator, List, Optional
+
+from autogpt.llm.base import Message
+
+
+class MessageHistory(List[Message]):
+    """
+    The list of the messages sent between the user and the AI.
+
+    Every message has a sequence ID: its position in the whole conversation. IDs
+    are not stored in the messages, which are sent to the API as they are, but
+    derived from first_id, the ID of the first message still in the list, so that
+    they do not change when older messages are dropped from its start.
+
+    If max_messages and spill_path are set, the list only keeps a tail of the
+    history in memory: once it holds more than max_messages messages, the oldest
+    ones are appended to the JSON lines file at spill_path, until half of them are
+    left. Spilled messages can still be read by ID, from the file.
+    """
+
+    def __init__(
+        self,
+        messages: Iterable[Message] = (),
+        first_id: int = 0,
+        max_messages: int = 0,
+        spill_path: Optional[str] = None,
+    ) -> None:
+        super().__init__(messages)
+        self.first_id = first_id
+        self.max_messages = max_messages
+        self.spill_path = spill_path
+        # The ID of the first spilled message, and the offsets of the spilled
+        # messages in the file
+        self._spilled_first_id = first_id
+        self._spilled_offsets = array("q")
+
+    @property
+    def next_id(self) -> int:
+        """The ID the next appended message will get"""
+        return self.first_id + len(self)
+
+    def get_id(self, index: int) -> int:
+        """Return the ID of the message at an index of the list"""
+        return self.first_id + index
+
+    def get_index(self, message_id: int) -> int:
+        """Return the index of the message with an ID, 0 if it was dropped"""
+        return max(message_id - self.first_id, 0)
+
+    def append(self, message: Message) -> None:
+        super().append(message)
+        self._spill_if_full()
+
+    def extend(self, messages: Iterable[Message]) -> None:
+        super().extend(messages)
+        self._spill_if_full()
+
+    def _spill_if_full(self) -> None:
+        if self.max_messages > 0 and len(self) > self.max_messages:
+            self.spill(len(self) - self.max_messages // 2)
+
+    def spill(self, count: int) -> None:
+        """
+        Move the oldest messages from memory to the spill file.
+
+        Args:
+            count (int): The number of messages to move.
+        """
+        if self.spill_path is None or count <= 0:
+            return
+        if self._spilled_first_id + len(self._spilled_offsets) != self.first_id:
+            # Messages were dropped without being spilled, there would be a gap
+            self._spilled_first_id = self.first_id
+            self._spilled_offsets = array("q")
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+        with open(self.spill_path, "ab") as spill_file:
+            for message in self[:count]:
+                self._spilled_offsets.append(spill_file.tell())
+                line = json.dumps(message, ensure_ascii=False) + "\n"
+                spill_file.write(line.encode("utf-8"))
+        del self[:count]
+        self.first_id += count
+
+    def get_message(self, message_id: int) -> Message:
+        """
+        Return the message with an ID, reading it from the spill file if needed.
+
+        Raises:
+            IndexError: If there is no message with the ID.
+        """
+        if message_id >= self.first_id:
+            return self[message_id - self.first_id]
+        return next(self.iter_messages(message_id, message_id + 1))
+
+    def iter_messages(
+        self, start_id: int = 0, end_id: Optional[int] = None
+    ) -> Iterator[Message]:
+        """
+        Iterate over the messages with IDs from start_id to end_id (excluded), first
+        reading the spilled ones from the file, one at a time.
+
+        Raises:
+            IndexError: If some of the messages are neither in memory nor spilled.
+        """
+        if end_id is None or end_id > self.next_id:
+            end_id = self.next_id
+        if start_id >= end_id:
+            return
+
+        if start_id < self.first_id:
+            spilled_index = start_id - self._spilled_first_id
+            spilled_end = min(end_id, self.first_id) - self._spilled_first_id
+            if spilled_index < 0 or spilled_end > len(self._spilled_offsets):
+                raise IndexError(f"Message {start_id} was dropped from the history")
+            with open(self.spill_path, "rb") as spill_file:
+                spill_file.seek(self._spilled_offsets[spilled_index])
+                for _ in range(spilled_index, spilled_end):
+                    yield json.loads(spill_file.readline())
+            start_id = self.first_id
+
+        yield from self[start_id - self.first_id : end_id - self.first_id]
+
+    def get_messages(
+        self, start_id: int, end_id: Optional[int] = None
+    ) -> List[Message]:
+        """Return the messages with IDs from start_id to end_id (excluded)"""
+        return list(self.iter_messages(start_id, end_id))
@@ -8,3 +8,17 @@ COSTS = {
     "gpt-4-32k-0314": {"prompt": 0.06, "completion": 0.12},
     "text-embedding-ada-002": {"prompt": 0.0004, "completion": 0.0},
 }
+
+# Default pay-as-you-go rate limits, in requests and tokens per minute
+RATE_LIMITS = {
+    "gpt-3.5-turbo": {"requests_per_minute": 3500, "tokens_per_minute": 90000},
+    "gpt-3.5-turbo-0301": {"requests_per_minute": 3500, "tokens_per_minute": 90000},
+    "gpt-4": {"requests_per_minute": 200, "tokens_per_minute": 40000},
+    "gpt-4-0314": {"requests_per_minute": 200, "tokens_per_minute": 40000},
+    "gpt-4-32k": {"requests_per_minute": 200, "tokens_per_minute": 80000},
+    "gpt-4-32k-0314": {"requests_per_minute": 200, "tokens_per_minute": 80000},
+    "text-embedding-ada-002": {
+        "requests_per_minute": 3000,
+        "tokens_per_minute": 1000000,
+    },
+}
@@ -0,0 +1,69 @@
+"""Persistent cache of chat completion responses for deterministic requests."""
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from autogpt.config import Config
+from autogpt.llm.base import Message
+from autogpt.llm.sqlite_cache import SQLiteLRUCache
+
+RESPONSE_CACHE_FILE = "response_cache.sqlite3"
+
+_cache: Optional[ResponseCache] = None
+
+
+def request_key(
+    model: str, messages: List[Message], temperature: float, max_tokens: Optional[int]
+) -> str:
+    """Return a hash that is the same for every identical chat completion request."""
+    request = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(SQLiteLRUCache):
+    """An SQLite table of chat completion responses, keyed by request_key.
+
+    Responses expire ttl seconds after they were stored, and the least recently
+    used ones are evicted once the table holds more than max_entries responses.
+    """
+
+    table = "responses"
+
+    def __init__(self, path: Path, max_entries: int, ttl: float) -> None:
+        super().__init__(path, max_entries)
+        self.ttl = ttl
+        self.delete_created_before(time.time() - ttl)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response to a request, or None if there is none."""
+        return super().get(key, created_after=time.time() - self.ttl)
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the response cache of the workspace, or None if it is disabled."""
+    global _cache
+    cfg = Config()
+    if cfg.response_cache_size <= 0 or cfg.workspace_path is None:
+        return None
+
+    _cache = ResponseCache.reopen(
+        _cache,
+        Path(cfg.workspace_path) / RESPONSE_CACHE_FILE,
+        max_entries=cfg.response_cache_size,
+        ttl=cfg.response_cache_ttl,
+    )
+    return _cache
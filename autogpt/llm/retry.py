@@ -0,0 +1,122 @@
+"""Backoff and circuit breaking for the retries of failed OpenAI API requests."""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Optional
+
+from openai.error import OpenAIError, Timeout
+
+# Server errors that are worth retrying, other ones will not go away by waiting
+RETRYABLE_STATUSES = {502, 503, 504}
+
+
+class CircuitOpenError(OpenAIError):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+
+def is_retryable_server_error(error: Exception) -> bool:
+    """Return whether the error is a transient failure of the API servers"""
+    return isinstance(error, Timeout) or (
+        isinstance(error, OpenAIError) and error.http_status in RETRYABLE_STATUSES
+    )
+
+
+def is_server_error(error: Exception) -> bool:
+    """Return whether the error is a failure of the API servers (5xx or timeout)"""
+    if is_retryable_server_error(error):
+        return True
+    status = getattr(error, "http_status", None)
+    return isinstance(error, OpenAIError) and status is not None and status >= 500
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Return the number of seconds to wait given by the Retry-After header, if any"""
+    headers = getattr(error, "headers", None) or {}
+    for name, value in headers.items():
+        if name.lower() == "retry-after":
+            try:
+                return max(float(value), 0.0)
+            except (TypeError, ValueError):
+                # The header can also be an HTTP date, which the API does not send
+                return None
+    return None
+
+
+class Backoff:
+    """
+    Delays between the attempts of a request, with decorrelated jitter.
+
+    Every delay is drawn at random between the base delay and three times the
+    previous one, so that clients that failed together do not retry together.
+    A Retry-After hint from the server is used as is instead. Once the delays
+    would add up to more than max_total_wait, next_delay returns None.
+    """
+
+    def __init__(self, base: float, cap: float, max_total_wait: float) -> None:
+        self.base = base
+        self.cap = cap
+        self.max_total_wait = max_total_wait
+        self.total_wait = 0.0
+        self._delay = base
+
+    def next_delay(self, retry_after: Optional[float] = None) -> Optional[float]:
+        if retry_after is not None:
+            delay = retry_after
+        else:
+            delay = min(self.cap, random.uniform(self.base, self._delay * 3))
+            self._delay = delay
+        if self.total_wait + delay > self.max_total_wait:
+            return None
+        self.total_wait += delay
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to the API after repeated server errors.
+
+    After failure_threshold server errors in a row the circuit opens, and every
+    call fails at once with a CircuitOpenError for reset_timeout seconds. Then the
+    next call is let through: the circuit closes if it succeeds, and opens again if
+    it fails.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return (
+            self._opened_at is not None
+            and time.monotonic() - self._opened_at < self.reset_timeout
+        )
+
+    def check(self) -> None:
+        """Raise a CircuitOpenError if no request should be sent"""
+        with self._lock:
+            if self.is_open:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(
+                    f"The OpenAI API failed {self._failures} times in a row, "
+                    f"not sending requests for {remaining:.0f} more seconds"
+                )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def reset(self) -> None:
+        self.record_success()
@@ -0,0 +1,122 @@
+"""Persistent key-value store in SQLite that evicts the least recently used values."""
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Type, TypeVar, Union
+
+Value = Union[str, bytes]
+
+C = TypeVar("C", bound="SQLiteLRUCache")
+
+
+class SQLiteLRUCache:
+    """An SQLite table of values that evicts the least recently used ones.
+
+    Once the table holds more than max_entries values, the least recently used
+    ones are deleted. Subclasses set the name of the table and turn their own keys
+    and values into strings and bytes.
+    """
+
+    table = "entries"
+
+    def __init__(self, path: Path, max_entries: int) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " created REAL NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_last_used"
+                f" ON {self.table} (last_used)"
+            )
+        self._count()
+
+    @classmethod
+    def reopen(cls: Type[C], cache: Optional[C], path: Path, **settings) -> C:
+        """Return the cache if it is stored at path, or else close it and open the
+        one at path, then apply the settings (max_entries, ...) to it."""
+        if cache is None or cache.path != path:
+            if cache is not None:
+                cache.close()
+            cache = cls(path, **settings)
+        for name, value in settings.items():
+            setattr(cache, name, value)
+        return cache
+
+    def _count(self) -> None:
+        (self._size,) = self._connection.execute(
+            f"SELECT COUNT(*) FROM {self.table}"
+        ).fetchone()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def get(self, key: str, created_after: float = 0.0) -> Optional[Value]:
+        """Return the value cached under a key, or None if there is none.
+
+        Args:
+            key (str): The key of the value.
+            created_after (float): Values stored before this time are expired,
+                they are deleted instead of being returned.
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                f"SELECT value, created FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if created < created_after:
+                self._connection.execute(
+                    f"DELETE FROM {self.table} WHERE key = ?", (key,)
+                )
+                self._size -= 1
+                return None
+            self._connection.execute(
+                f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return value
+
+    def put(self, key: str, value: Value) -> None:
+        """Cache a value under a key, evicting the least recently used ones."""
+        now = time.time()
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                f"INSERT OR IGNORE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._size += cursor.rowcount
+            if self._size > self.max_entries:
+                self._connection.execute(
+                    f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM"
+                    f" {self.table} ORDER BY last_used LIMIT ?)",
+                    (self._size - self.max_entries,),
+                )
+                self._size = self.max_entries
+
+    def delete_created_before(self, timestamp: float) -> None:
+        """Delete the values stored before a time."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"DELETE FROM {self.table} WHERE created < ?", (timestamp,)
+            )
+            self._count()
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(f"DELETE FROM {self.table}")
+            self._size = 0
+
+    def close(self) -> None:
+        self._connection.close()
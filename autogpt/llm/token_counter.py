@@ -1,12 +1,61 @@
 """Functions for counting the number of tokens in a message or string."""
 from __future__ import annotations
 
-from typing import List
+import functools
+from typing import List, Tuple
 
 import tiktoken
 
 from autogpt.llm.base import Message
-from autogpt.logs import logger
+
+# Number of messages whose token count is remembered
+TOKEN_COUNT_CACHE_SIZE = 4096
+
+# !Note: gpt-3.5-turbo and gpt-4 may change over time.
+# Their tokens are counted as those of the snapshot they currently point to.
+MODEL_ALIASES = {
+    "gpt-3.5-turbo": "gpt-3.5-turbo-0301",
+    "gpt-4": "gpt-4-0314",
+}
+
+# (tokens_per_message, tokens_per_name) for every supported chat model
+MESSAGE_TOKEN_OVERHEADS = {
+    # every message follows <|start|>{role/name}\n{content}<|end|>\n
+    # if there's a name, the role is omitted
+    "gpt-3.5-turbo-0301": (4, -1),
+    "gpt-4-0314": (3, 1),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(encoding_name: str) -> tiktoken.Encoding:
+    """
+    Returns the tokenizer with the given name, loading it only once per process.
+
+    Args:
+        encoding_name (str): The name of the encoding (e.g., "cl100k_base").
+
+    Returns:
+        tiktoken.Encoding: The tokenizer.
+    """
+    return tiktoken.get_encoding(encoding_name)
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding_for_model(model: str) -> tiktoken.Encoding:
+    """
+    Returns the tokenizer of a model, loading it only once per process.
+
+    Args:
+        model (str): The name of the model (e.g., "gpt-3.5-turbo").
+
+    Returns:
+        tiktoken.Encoding: The tokenizer.
+
+    Raises:
+        KeyError: If tiktoken does not know the model.
+    """
+    return tiktoken.encoding_for_model(model)
 
 
 def count_message_tokens(
@@ -15,6 +64,9 @@ def count_message_tokens(
     """
     Returns the number of tokens used by a list of messages.
 
+    The token count of every message is cached, so counting a conversation again
+    after adding a message only tokenizes the new message.
+
     Args:
         messages (list): A list of messages, each of which is a dictionary
             containing the role and content of the message.
@@ -24,27 +76,8 @@ def count_message_tokens(
     Returns:
         int: The number of tokens used by the list of messages.
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        logger.warn("Warning: model not found. Using cl100k_base encoding.")
-        encoding = tiktoken.get_encoding("cl100k_base")
-    if model == "gpt-3.5-turbo":
-        # !Note: gpt-3.5-turbo may change over time.
-        # Returning num tokens assuming gpt-3.5-turbo-0301.")
-        return count_message_tokens(messages, model="gpt-3.5-turbo-0301")
-    elif model == "gpt-4":
-        # !Note: gpt-4 may change over time. Returning num tokens assuming gpt-4-0314.")
-        return count_message_tokens(messages, model="gpt-4-0314")
-    elif model == "gpt-3.5-turbo-0301":
-        tokens_per_message = (
-            4  # every message follows <|start|>{role/name}\n{content}<|end|>\n
-        )
-        tokens_per_name = -1  # if there's a name, the role is omitted
-    elif model == "gpt-4-0314":
-        tokens_per_message = 3
-        tokens_per_name = 1
-    else:
+    model = MODEL_ALIASES.get(model, model)
+    if model not in MESSAGE_TOKEN_OVERHEADS:
         raise NotImplementedError(
             f"num_tokens_from_messages() is not implemented for model {model}.\n"
             " See https://github.com/openai/openai-python/blob/main/chatml.md for"
@@ -52,15 +85,23 @@ def count_message_tokens(
         )
     num_tokens = 0
     for message in messages:
-        num_tokens += tokens_per_message
-        for key, value in message.items():
-            num_tokens += len(encoding.encode(value))
-            if key == "name":
-                num_tokens += tokens_per_name
+        num_tokens += _count_single_message_tokens(model, tuple(message.items()))
     num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
     return num_tokens
 
 
+@functools.lru_cache(maxsize=TOKEN_COUNT_CACHE_SIZE)
+def _count_single_message_tokens(model: str, items: Tuple[Tuple[str, str], ...]) -> int:
+    tokens_per_message, tokens_per_name = MESSAGE_TOKEN_OVERHEADS[model]
+    encoding = get_encoding_for_model(model)
+    num_tokens = tokens_per_message
+    for key, value in items:
+        num_tokens += len(encoding.encode(value))
+        if key == "name":
+            num_tokens += tokens_per_name
+    return num_tokens
+
+
 def count_string_tokens(string: str, model_name: str) -> int:
     """
     Returns the number of tokens in a text string.
@@ -72,5 +113,5 @@ def count_string_tokens(string: str, model_name: str) -> int:
     Returns:
         int: The number of tokens in the text string.
     """
-    encoding = tiktoken.encoding_for_model(model_name)
+    encoding = get_encoding_for_model(model_name)
     return len(encoding.encode(string))
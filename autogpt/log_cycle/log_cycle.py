@@ -1,11 +1,12 @@
 import json
 import os
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Optional, Union
 
 from autogpt.logs import logger
 
 DEFAULT_PREFIX = "agent"
-FULL_MESSAGE_HISTORY_FILE_NAME = "full_message_history.json"
+FULL_MESSAGE_HISTORY_FILE_NAME = "full_message_history.jsonl"
+MESSAGE_HISTORY_SPILL_FILE_NAME = "message_history.jsonl"
 CURRENT_CONTEXT_FILE_NAME = "current_context.json"
 NEXT_ACTION_FILE_NAME = "next_action.json"
 PROMPT_SUMMARY_FILE_NAME = "prompt_summary.json"
@@ -20,13 +21,16 @@ class LogCycleHandler:
 
     def __init__(self):
         self.log_count_within_cycle = 0
+        # The ID of the first message of the history that was not logged yet
+        self.next_message_id = 0
 
     @staticmethod
     def create_directory_if_not_exists(directory_path: str) -> None:
         if not os.path.exists(directory_path):
             os.makedirs(directory_path, exist_ok=True)
 
-    def create_outer_directory(self, ai_name: str, created_at: str) -> str:
+    @staticmethod
+    def get_outer_directory(ai_name: str, created_at: str) -> str:
         log_directory = logger.get_log_directory()
 
         if os.environ.get("OVERWRITE_DEBUG") == "1":
@@ -35,7 +39,10 @@ class LogCycleHandler:
             ai_name_short = ai_name[:15] if ai_name else DEFAULT_PREFIX
             outer_folder_name = f"{created_at}_{ai_name_short}"
 
-        outer_folder_path = os.path.join(log_directory, "DEBUG", outer_folder_name)
+        return os.path.join(log_directory, "DEBUG", outer_folder_name)
+
+    def create_outer_directory(self, ai_name: str, created_at: str) -> str:
+        outer_folder_path = self.get_outer_directory(ai_name, created_at)
         self.create_directory_if_not_exists(outer_folder_path)
 
         return outer_folder_path
@@ -81,3 +88,62 @@ class LogCycleHandler:
 
         logger.log_json(json_data, log_file_path)
         self.log_count_within_cycle += 1
+
+    def log_new_messages(
+        self,
+        ai_name: str,
+        created_at: str,
+        cycle_count: int,
+        full_message_history: List[Dict[str, str]],
+    ) -> None:
+        """
+        Append the messages added to the history since the last call to the message
+        log of the run, a JSON lines file that read_message_history reads back.
+
+        Args:
+            full_message_history (list): The message history of the agent.
+        """
+        # A MessageHistory can have spilled the oldest new messages to disk
+        if hasattr(full_message_history, "iter_messages"):
+            next_id = full_message_history.next_id
+            new_messages = full_message_history.iter_messages(self.next_message_id)
+        else:
+            next_id = len(full_message_history)
+            new_messages = full_message_history[self.next_message_id :]
+        # Only create the log once there is something to write to it
+        if next_id <= self.next_message_id:
+            return
+
+        outer_folder_path = self.create_outer_directory(ai_name, created_at)
+        log_file_path = os.path.join(outer_folder_path, FULL_MESSAGE_HISTORY_FILE_NAME)
+        # Start a new log with the first messages, in case the folder is reused
+        mode = "a" if self.next_message_id else "w"
+        with open(log_file_path, mode, encoding="utf-8") as log_file:
+            for message_id, message in enumerate(new_messages, self.next_message_id):
+                entry = {"cycle": cycle_count, "id": message_id, "message": message}
+                log_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.next_message_id = next_id
+
+
+def read_message_history(
+    log_file_path: str, cycle_count: Optional[int] = None
+) -> List[Dict[str, str]]:
+    """
+    Rebuild the message history of a run from its message log.
+
+    Args:
+        log_file_path (str): The path of the message log of the run.
+        cycle_count (int, optional): The cycle to rebuild the history as it was at
+            the start of. Defaults to the end of the run.
+
+    Returns:
+        list: The messages of the history.
+    """
+    messages = []
+    with open(log_file_path, encoding="utf-8") as log_file:
+        for line in log_file:
+            entry = json.loads(line)
+            if cycle_count is not None and entry["cycle"] > cycle_count:
+                break
+            messages.append(entry["message"])
+    return messages
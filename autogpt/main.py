@@ -9,6 +9,7 @@ from autogpt.agent.agent import Agent
 from autogpt.commands.command import CommandRegistry
 from autogpt.config import Config, check_openai_api_key
 from autogpt.configurator import create_config
+from autogpt.llm.message_history import MessageHistory
 from autogpt.logs import logger
 from autogpt.memory import get_memory
 from autogpt.plugins import scan_plugins
@@ -158,7 +159,7 @@ def run_auto_gpt(
         ai_name = ai_config.ai_name
     # print(prompt)
     # Initialize variables
-    full_message_history = []
+    full_message_history = MessageHistory()
     next_action_count = 0
 
     # add chat plugins capable of report to logger
@@ -76,7 +76,7 @@ def get_memory(cfg, init=False):
 
     if memory is None:
         memory = LocalCache(cfg)
-        if init:
+        if init and cfg.wipe_local_memory_on_start:
             memory.clear()
     return memory
 
@@ -1,15 +1,25 @@
 """Base class for memory providers."""
 import abc
+import hashlib
 
 from autogpt.singleton import AbstractSingleton
 
 
+def content_hash(text: str) -> str:
+    """Get the hex digest used to detect texts that are already in memory."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
 class MemoryProviderSingleton(AbstractSingleton):
     @abc.abstractmethod
     def add(self, data):
         """Adds to memory"""
         pass
 
+    def add_many(self, data_list):
+        """Adds several items to memory"""
+        return [self.add(data) for data in data_list]
+
     @abc.abstractmethod
     def get(self, data):
         """Gets from memory"""
@@ -25,6 +35,10 @@ class MemoryProviderSingleton(AbstractSingleton):
         """Gets relevant memory for"""
         pass
 
+    def get_relevant_batch(self, data_list, num_relevant=5):
+        """Gets relevant memory for each of several queries"""
+        return [self.get_relevant(data, num_relevant) for data in data_list]
+
     @abc.abstractmethod
     def get_stats(self):
         """Get stats from memory"""
@@ -1,33 +1,710 @@
 from __future__ import annotations
 
-import dataclasses
+from collections.abc import Sequence
 from pathlib import Path
 from typing import Any, List
 
 import numpy as np
-import orjson
 
-from autogpt.llm import get_ada_embedding
-from autogpt.memory.base import MemoryProviderSingleton
+from autogpt.llm import get_ada_embedding, get_ada_embeddings
+from autogpt.logs import logger
+from autogpt.memory.base import MemoryProviderSingleton, content_hash
 
 EMBED_DIM = 1536
-SAVE_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_SERIALIZE_DATACLASS
+EMBED_DTYPE = np.float32
+OFFSET_DTYPE = np.int64
+ROW_BYTES = EMBED_DIM * np.dtype(EMBED_DTYPE).itemsize
+OFFSET_BYTES = np.dtype(OFFSET_DTYPE).itemsize
+HASH_BYTES = 32
+MIN_BUFFER_CAPACITY = 16
+LIST_DTYPE = np.int32
+# Rows per list needed before the IVF index is trained, and rows per list
+# sampled to train it
+IVF_MIN_ROWS_PER_LIST = 39
+IVF_TRAIN_ROWS_PER_LIST = 256
+IVF_TRAIN_ITERATIONS = 10
+IVF_ASSIGN_BATCH_SIZE = 4096
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Compact rows are converted to float32 in batches small enough to stay in the
+# CPU cache while they are scored
+SCORE_BATCH_SIZE = 256
+QUANTIZE_BATCH_SIZE = 4096
+# Candidates per requested result that are rescored at full precision when the
+# embeddings are held in a compact dtype
+RESCORE_FACTOR = 4
 
 
 def create_default_embeddings():
     return np.zeros((0, EMBED_DIM)).astype(np.float32)
 
 
-@dataclasses.dataclass
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Find the indices of the k highest scores along the last axis.
+
+    Only the k winners are sorted, so this is O(n + k log k) instead of the
+    O(n log n) of a full sort.
+
+    Args:
+        scores: The scores, either one row or one row per query
+        k: The number of indices to return
+
+    Returns: The indices of the top-k scores, highest score first
+    """
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1)
+    return np.take_along_axis(top, order, axis=-1)
+
+
+def rescore(
+    indices: np.ndarray, embedding: np.ndarray, k: int, embeddings: np.ndarray
+) -> np.ndarray:
+    """
+    Rank candidate rows by their full-precision score
+
+    Args:
+        indices: The indices of the candidate rows
+        embedding: The embedding to compare to
+        k: The number of indices to return
+        embeddings: The full-precision embeddings of all rows
+
+    Returns: The indices of the top-k candidates, highest score first
+    """
+    indices = np.sort(indices)
+    scores = np.dot(embeddings[indices], embedding)
+    return indices[top_k_indices(scores, k)]
+
+
+class StoredTexts(Sequence):
+    """The texts of a SegmentStore, read from disk only when accessed.
+
+    Texts appended after loading are kept in memory.
+    """
+
+    def __init__(self, texts_file: Path, ends: np.ndarray) -> None:
+        self.texts_file = texts_file
+        self.ends = ends
+        self.appended: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ends) + len(self.appended)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("text index out of range")
+        if index >= len(self.ends):
+            return self.appended[index - len(self.ends)]
+
+        start = int(self.ends[index - 1]) if index > 0 else 0
+        with self.texts_file.open("rb") as f:
+            f.seek(start)
+            return f.read(int(self.ends[index]) - start).decode("utf-8")
+
+    def append(self, text: str) -> None:
+        self.appended.append(text)
+
+
+def quantize(
+    vectors: np.ndarray, dtype: np.dtype
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Convert embeddings to a compact storage dtype.
+
+    int8 uses symmetric scalar quantization with one scale per row, so that
+    the largest component of every row maps to 127.
+
+    Args:
+        vectors: The embeddings, one per row
+        dtype: The storage dtype
+
+    Returns: The converted rows, and the per-row scales for int8
+    """
+    vectors = np.asarray(vectors, dtype=EMBED_DTYPE)
+    if dtype != np.int8:
+        return vectors.astype(dtype), None
+    scales = np.abs(vectors).max(axis=-1) / 127
+    scales[scales == 0] = 1
+    codes = np.round(vectors / scales[:, np.newaxis]).astype(np.int8)
+    return codes, scales.astype(EMBED_DTYPE)
+
+
+def dequantize(codes: np.ndarray, scales: np.ndarray | None) -> np.ndarray:
+    """
+    Convert rows back to float32
+
+    Args:
+        codes: The rows in their storage dtype
+        scales: The per-row scales for int8, else None
+
+    Returns: The approximate float32 rows
+    """
+    rows = np.asarray(codes, dtype=EMBED_DTYPE)
+    if scales is not None:
+        rows = rows * scales[:, np.newaxis]
+    return rows
+
+
 class CacheContent:
-    texts: List[str] = dataclasses.field(default_factory=list)
-    embeddings: np.ndarray = dataclasses.field(
-        default_factory=create_default_embeddings
-    )
+    """The texts and embeddings held by the local cache.
+
+    Embeddings loaded from a SegmentStore stay memory-mapped. Rows added after
+    that are kept in an in-memory buffer whose capacity doubles whenever it
+    fills up, so adding a row is amortized O(1).
+
+    Embeddings can be held in a compact dtype (see `quantize`), in which case
+    scores are approximate and should be rescored at full precision.
+    """
+
+    def __init__(
+        self,
+        texts: List[str] | StoredTexts | None = None,
+        embeddings: np.ndarray | None = None,
+        scales: np.ndarray | None = None,
+        dtype: np.dtype = EMBED_DTYPE,
+    ) -> None:
+        self.texts = texts if texts is not None else []
+        self.dtype = np.dtype(dtype)
+        self.mapped = (
+            embeddings
+            if embeddings is not None
+            else np.zeros((0, EMBED_DIM), dtype=self.dtype)
+        )
+        if scales is None and self.is_int8:
+            # No mapped rows, keep the scales indexable like the rows
+            scales = np.ones(len(self.mapped), dtype=EMBED_DTYPE)
+        self.mapped_scales = scales
+        self.buffer = np.zeros((0, EMBED_DIM), dtype=self.dtype)
+        self.buffer_scales = np.zeros(0, dtype=EMBED_DTYPE)
+        self.size = 0
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype != EMBED_DTYPE
+
+    @property
+    def segments(self) -> list[tuple[np.ndarray, np.ndarray | None]]:
+        """The non-empty embedding matrices and their scales, in row order"""
+        buffer_scales = self.buffer_scales[: self.size] if self.is_int8 else None
+        return [
+            (segment, scales)
+            for segment, scales in (
+                (self.mapped, self.mapped_scales),
+                (self.buffer[: self.size], buffer_scales),
+            )
+            if len(segment)
+        ]
+
+    @property
+    def is_int8(self) -> bool:
+        return self.dtype == np.int8
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """All embeddings as a single float32 matrix. Copies unless the rows are
+        float32 and in a single segment."""
+        segments = self.segments
+        if not segments:
+            return create_default_embeddings()
+        if len(segments) == 1 and not self.quantized:
+            return segments[0][0]
+        return np.concatenate(
+            [dequantize(segment, scales) for segment, scales in segments], axis=0
+        )
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.mapped) + self.size, EMBED_DIM
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Gather rows from all segments
+
+        Args:
+            indices: The row indices to gather
+
+        Returns: A float32 matrix with the requested rows
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        mapped = len(self.mapped)
+        in_mapped = indices < mapped
+        rows = np.empty((len(indices), EMBED_DIM), dtype=EMBED_DTYPE)
+        mapped_indices = indices[in_mapped]
+        buffer_indices = indices[~in_mapped] - mapped
+        rows[in_mapped] = dequantize(
+            self.mapped[mapped_indices],
+            self.mapped_scales[mapped_indices] if self.is_int8 else None,
+        )
+        rows[~in_mapped] = dequantize(
+            self.buffer[buffer_indices],
+            self.buffer_scales[buffer_indices] if self.is_int8 else None,
+        )
+        return rows
+
+    def append(self, text: str, vector: np.ndarray) -> None:
+        """
+        Add a text and its embedding, growing the buffer if it is full.
+
+        Args:
+            text: The text to add
+            vector: The embedding of the text
+        """
+        if self.size == len(self.buffer):
+            capacity = max(MIN_BUFFER_CAPACITY, 2 * len(self.buffer))
+            buffer = np.empty((capacity, EMBED_DIM), dtype=self.dtype)
+            buffer[: self.size] = self.buffer[: self.size]
+            self.buffer = buffer
+            buffer_scales = np.ones(capacity, dtype=EMBED_DTYPE)
+            buffer_scales[: self.size] = self.buffer_scales[: self.size]
+            self.buffer_scales = buffer_scales
+        codes, scales = quantize(vector[np.newaxis, :], self.dtype)
+        self.buffer[self.size] = codes[0]
+        if scales is not None:
+            self.buffer_scales[self.size] = scales[0]
+        self.size += 1
+        self.texts.append(text)
+
+    def scores(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Score every row against one or more embeddings
+
+        Compact rows are converted to float32 in batches, so scoring never holds
+        more than SCORE_BATCH_SIZE converted rows in memory. Their int8 scales
+        are applied to the scores rather than to the rows.
+
+        Args:
+            embeddings: The embedding to compare to, or a matrix with one
+                embedding per row
+
+        Returns: The dot product of each row with each embedding, with shape
+            (rows,) for a single embedding or (embeddings, rows) for a matrix
+        """
+        embeddings = np.asarray(embeddings, dtype=EMBED_DTYPE)
+        scores = []
+        for segment, scales in self.segments:
+            if not self.quantized:
+                scores.append(np.dot(segment, embeddings.T).T)
+                continue
+            for start in range(0, len(segment), SCORE_BATCH_SIZE):
+                end = start + SCORE_BATCH_SIZE
+                rows = segment[start:end].astype(EMBED_DTYPE)
+                batch_scores = np.dot(rows, embeddings.T).T
+                if scales is not None:
+                    batch_scores = batch_scores * scales[start:end]
+                scores.append(batch_scores)
+        return np.concatenate(
+            scores or [np.zeros(embeddings.shape[:-1] + (0,), dtype=EMBED_DTYPE)],
+            axis=-1,
+        )
+
+
+class SegmentStore:
+    """Append-only on-disk storage for the local cache.
+
+    Embeddings are stored as raw float32 rows in `<name>.embeddings`. Texts are
+    stored back to back as UTF-8 in `<name>.texts`, and the end offset of every
+    text is recorded in `<name>.offsets`, and its content hash in
+    `<name>.hashes`. Adding data only appends to these files, so the cost of an
+    add does not depend on the size of the cache.
+
+    With a compact storage dtype, the rows are also stored in that dtype in
+    `<name>.embeddings.<dtype>`, with the int8 scales in `<name>.scales`. The
+    compact rows are loaded for searching, and the float32 rows are kept for
+    rescoring.
+    """
+
+    def __init__(
+        self, directory: Path, name: str, dtype: np.dtype = EMBED_DTYPE
+    ) -> None:
+        """Initialize the store, creating its files if they don't exist
+
+        Args:
+            directory: The directory to keep the segment files in
+            name: The common name of the segment files
+            dtype: The dtype to load the embeddings in
+        """
+        self.dtype = np.dtype(dtype)
+        self.embeddings_file = directory / f"{name}.embeddings"
+        self.texts_file = directory / f"{name}.texts"
+        self.offsets_file = directory / f"{name}.offsets"
+        self.hashes_file = directory / f"{name}.hashes"
+        self.codes_file = directory / f"{name}.embeddings.{self.dtype.name}"
+        self.scales_file = directory / f"{name}.scales"
+        for file in self.files:
+            file.touch(exist_ok=True)
+
+    @property
+    def quantized(self) -> bool:
+        return self.dtype != EMBED_DTYPE
+
+    @property
+    def files(self) -> tuple[Path, ...]:
+        files = (
+            self.embeddings_file,
+            self.texts_file,
+            self.offsets_file,
+            self.hashes_file,
+        )
+        if self.quantized:
+            files += (self.codes_file,)
+        if self.dtype == np.int8:
+            files += (self.scales_file,)
+        return files
+
+    def __len__(self) -> int:
+        """The number of complete rows. A partially written row is ignored."""
+        return min(
+            self.embeddings_file.stat().st_size // ROW_BYTES,
+            self.offsets_file.stat().st_size // OFFSET_BYTES,
+        )
+
+    def clear(self) -> None:
+        """
+        Truncate all segment files, and delete the compact rows left in the
+        other storage dtypes, which would no longer match the float32 rows.
+        """
+        for file in self.files:
+            with file.open("wb"):
+                pass
+        for dtype in STORAGE_DTYPES.values():
+            codes_file = self.embeddings_file.with_name(
+                f"{self.embeddings_file.name}.{np.dtype(dtype).name}"
+            )
+            if codes_file not in self.files:
+                codes_file.unlink(missing_ok=True)
+        if self.scales_file not in self.files:
+            self.scales_file.unlink(missing_ok=True)
+
+    def append(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """
+        Append rows to the segment files.
+
+        The offsets are written last, so a row only becomes visible once all
+        of its data is on disk. Anything past the last complete row (e.g. left
+        behind by an interrupted write) is overwritten.
+
+        Args:
+            texts: The texts to append
+            embeddings: The embeddings of the texts, one row per text
+        """
+        rows = len(self)
+        text_end = self._text_end(rows)
+        encoded = [text.encode("utf-8") for text in texts]
+        ends = text_end + np.cumsum([len(e) for e in encoded], dtype=OFFSET_DTYPE)
+        vectors = np.ascontiguousarray(embeddings, dtype=EMBED_DTYPE)
+
+        self._write_at(self.texts_file, text_end, b"".join(encoded))
+        self._write_at(self.hashes_file, rows * HASH_BYTES, self._hashes(texts))
+        self._write_at(self.embeddings_file, rows * ROW_BYTES, vectors.tobytes())
+        if self.quantized:
+            self._append_codes(rows, vectors)
+        self._write_at(self.offsets_file, rows * OFFSET_BYTES, ends.tobytes())
+
+    def load(self) -> CacheContent:
+        """
+        Load the stored rows without reading them into memory.
+
+        The embeddings and text offsets are memory-mapped and the texts are read
+        on access, so loading takes the same time regardless of the store size.
+        The only exception is the first load with a new compact dtype, which
+        converts the existing rows.
+
+        Returns: The content of the store
+        """
+        rows = len(self)
+        if rows == 0:
+            return CacheContent(dtype=self.dtype)
+
+        scales = None
+        if self.quantized:
+            self._convert_missing_codes(rows)
+            embeddings = np.memmap(
+                self.codes_file, dtype=self.dtype, mode="r", shape=(rows, EMBED_DIM)
+            )
+            if self.dtype == np.int8:
+                scales = np.memmap(
+                    self.scales_file, dtype=EMBED_DTYPE, mode="r", shape=(rows,)
+                )
+        else:
+            embeddings = self.full_embeddings(rows)
+        ends = np.memmap(self.offsets_file, dtype=OFFSET_DTYPE, mode="r", shape=(rows,))
+        return CacheContent(
+            texts=StoredTexts(self.texts_file, ends),
+            embeddings=embeddings,
+            scales=scales,
+            dtype=self.dtype,
+        )
+
+    def load_hashes(self) -> set[bytes]:
+        """
+        Load the content hashes of the stored texts, computing any that are
+        missing from the hashes file.
+
+        Returns: The content hashes
+        """
+        rows = len(self)
+        hashed = min(rows, self.hashes_file.stat().st_size // HASH_BYTES)
+        with self.hashes_file.open("rb") as f:
+            data = f.read(hashed * HASH_BYTES)
+        if hashed < rows:
+            missing = self._hashes(self.load().texts[hashed:rows])
+            self._write_at(self.hashes_file, hashed * HASH_BYTES, missing)
+            data += missing
+        return {data[i : i + HASH_BYTES] for i in range(0, len(data), HASH_BYTES)}
+
+    def full_embeddings(self, rows: int | None = None) -> np.ndarray:
+        """
+        Memory-map the float32 embeddings
+
+        Args:
+            rows: The number of rows to map. Defaults to all complete rows.
+
+        Returns: The float32 embeddings
+        """
+        rows = len(self) if rows is None else rows
+        if rows == 0:
+            return create_default_embeddings()
+        return np.memmap(
+            self.embeddings_file, dtype=EMBED_DTYPE, mode="r", shape=(rows, EMBED_DIM)
+        )
+
+    def _append_codes(self, first_row: int, vectors: np.ndarray) -> None:
+        codes, scales = quantize(vectors, self.dtype)
+        self._write_at(
+            self.codes_file,
+            first_row * EMBED_DIM * self.dtype.itemsize,
+            codes.tobytes(),
+        )
+        if scales is not None:
+            self._write_at(
+                self.scales_file,
+                first_row * np.dtype(EMBED_DTYPE).itemsize,
+                scales.tobytes(),
+            )
+
+    def _convert_missing_codes(self, rows: int) -> None:
+        converted = self.codes_file.stat().st_size // (EMBED_DIM * self.dtype.itemsize)
+        if self.dtype == np.int8:
+            converted = min(
+                converted,
+                self.scales_file.stat().st_size // np.dtype(EMBED_DTYPE).itemsize,
+            )
+        if converted >= rows:
+            return
+
+        full = self.full_embeddings(rows)
+        for start in range(converted, rows, QUANTIZE_BATCH_SIZE):
+            self._append_codes(start, full[start : start + QUANTIZE_BATCH_SIZE])
+
+    def _text_end(self, rows: int) -> int:
+        if rows == 0:
+            return 0
+        with self.offsets_file.open("rb") as f:
+            f.seek((rows - 1) * OFFSET_BYTES)
+            return int(np.frombuffer(f.read(OFFSET_BYTES), dtype=OFFSET_DTYPE)[0])
+
+    @staticmethod
+    def _hashes(texts: List[str]) -> bytes:
+        return b"".join(bytes.fromhex(content_hash(text)) for text in texts)
+
+    @staticmethod
+    def _write_at(file: Path, position: int, data: bytes) -> None:
+        with file.open("r+b") as f:
+            f.seek(position)
+            f.write(data)
+            f.truncate()
+
+
+class IVFIndex:
+    """An inverted file index for approximate nearest-neighbour search.
+
+    Every row is assigned to the nearest of `num_lists` k-means centroids, and
+    a query only scores the rows in the `num_probes` lists whose centroids are
+    closest to it. More probes give better recall at the cost of latency. The
+    index is trained once the cache holds enough rows; until then, searches
+    score every row.
+
+    The centroids and the list of every row are kept next to the segment
+    files. New rows are assigned to the existing centroids and their lists are
+    appended to the assignments file.
+    """
+
+    def __init__(
+        self, directory: Path, name: str, num_lists: int, num_probes: int
+    ) -> None:
+        """Initialize the index
+
+        Args:
+            directory: The directory to keep the index files in
+            name: The common name of the index files
+            num_lists: The number of k-means centroids
+            num_probes: The number of lists to score for each query
+        """
+        self.centroids_file, self.assignments_file = self.index_files(directory, name)
+        self.num_lists = num_lists
+        self.num_probes = num_probes
+        self.centroids: np.ndarray | None = None
+        self.lists: list[list[int]] = []
+        self.size = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @staticmethod
+    def index_files(directory: Path, name: str) -> tuple[Path, Path]:
+        """The centroids and assignments files of an index"""
+        return (
+            directory / f"{name}.ivf.centroids",
+            directory / f"{name}.ivf.assignments",
+        )
+
+    @classmethod
+    def delete_files(cls, directory: Path, name: str) -> None:
+        """Delete the files of an index, which no longer match a wiped store"""
+        for file in cls.index_files(directory, name):
+            file.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Forget the centroids and assignments, also on disk"""
+        self.centroids = None
+        self.lists = []
+        self.size = 0
+        for file in (self.centroids_file, self.assignments_file):
+            file.unlink(missing_ok=True)
+
+    def load(self, data: CacheContent) -> None:
+        """
+        Load the index files and bring the index up to date with the data.
+
+        Args:
+            data: The content of the cache
+        """
+        if self.centroids_file.exists() and self.assignments_file.exists():
+            centroids = np.load(self.centroids_file)
+            if centroids.shape == (self.num_lists, EMBED_DIM):
+                assignments = np.fromfile(self.assignments_file, dtype=LIST_DTYPE)
+                if len(assignments) > data.shape[0]:
+                    assignments = assignments[: data.shape[0]]
+                    self._write_assignments(assignments)
+                self.centroids = centroids
+                self._extend_lists(assignments, 0)
+                self.size = len(assignments)
+        self.update(data)
+
+    def update(self, data: CacheContent) -> None:
+        """
+        Assign the rows added to the data since the last update, training the
+        index first if there are enough rows.
+
+        Args:
+            data: The content of the cache
+        """
+        rows = data.shape[0]
+        if not self.trained:
+            if rows < self.num_lists * IVF_MIN_ROWS_PER_LIST:
+                return
+            self.train(data)
+            return
+        if rows <= self.size:
+            return
+
+        assignments = self.assign(data, self.size, rows)
+        self._extend_lists(assignments, self.size)
+        with self.assignments_file.open("ab") as f:
+            f.write(assignments.tobytes())
+        self.size = rows
+
+    def train(self, data: CacheContent) -> None:
+        """
+        Compute the centroids with k-means over a sample of the rows, then
+        assign every row to a list.
+
+        Args:
+            data: The content of the cache
+        """
+        rows = data.shape[0]
+        rng = np.random.default_rng(0)
+        sample_size = min(rows, self.num_lists * IVF_TRAIN_ROWS_PER_LIST)
+        sample = data.take(np.sort(rng.choice(rows, sample_size, replace=False)))
+
+        centroids = sample[rng.choice(sample_size, self.num_lists, replace=False)]
+        for _ in range(IVF_TRAIN_ITERATIONS):
+            labels = np.argmax(np.dot(sample, centroids.T), axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self.centroids = centroids.astype(EMBED_DTYPE)
+        with self.centroids_file.open("wb") as f:
+            np.save(f, self.centroids)
+
+        self.lists = []
+        assignments = self.assign(data, 0, rows)
+        self._extend_lists(assignments, 0)
+        self._write_assignments(assignments)
+        self.size = rows
+
+    def assign(self, data: CacheContent, start: int, end: int) -> np.ndarray:
+        """
+        Find the nearest centroid of each row in a range. The rows are read in
+        batches, so that only one batch at a time is converted to float32.
+
+        Args:
+            data: The content of the cache
+            start: The first row to assign
+            end: The row after the last one to assign
+
+        Returns: The list of each row
+        """
+        assignments = [np.empty(0, dtype=LIST_DTYPE)]
+        for batch_start in range(start, end, IVF_ASSIGN_BATCH_SIZE):
+            batch_end = min(batch_start + IVF_ASSIGN_BATCH_SIZE, end)
+            batch = data.take(np.arange(batch_start, batch_end))
+            assignments.append(np.argmax(np.dot(batch, self.centroids.T), axis=1))
+        return np.concatenate(assignments).astype(LIST_DTYPE)
+
+    def search(self, data: CacheContent, embedding: np.ndarray, k: int) -> np.ndarray:
+        """
+        Find the approximate top-k rows for an embedding
+
+        Args:
+            data: The content of the cache
+            embedding: The embedding to compare to
+            k: The number of rows to return
+
+        Returns: The indices of the top-k rows, highest score first
+        """
+        probes = top_k_indices(np.dot(self.centroids, embedding), self.num_probes)
+        candidates = np.fromiter(
+            (i for probe in probes for i in self.lists[probe]), dtype=np.intp
+        )
+        candidates.sort()
+        scores = np.dot(data.take(candidates), embedding)
+        return candidates[top_k_indices(scores, k)]
+
+    def _extend_lists(self, assignments: np.ndarray, first_row: int) -> None:
+        if not self.lists:
+            self.lists = [[] for _ in range(self.num_lists)]
+        for row, assignment in enumerate(assignments.tolist(), start=first_row):
+            self.lists[assignment].append(row)
+
+    def _write_assignments(self, assignments: np.ndarray) -> None:
+        with self.assignments_file.open("wb") as f:
+            f.write(assignments.astype(LIST_DTYPE).tobytes())
 
 
 class LocalCache(MemoryProviderSingleton):
-    """A class that stores the memory in a local file"""
+    """A class that stores the memory in local append-only files"""
 
     def __init__(self, cfg) -> None:
         """Initialize a class instance
@@ -39,15 +716,28 @@ class LocalCache(MemoryProviderSingleton):
             None
         """
         workspace_path = Path(cfg.workspace_path)
-        self.filename = workspace_path / f"{cfg.memory_index}.json"
-
-        self.filename.touch(exist_ok=True)
-
-        file_content = b"{}"
-        with self.filename.open("w+b") as f:
-            f.write(file_content)
-
-        self.data = CacheContent()
+        self.workspace_path = workspace_path
+        self.memory_index = cfg.memory_index
+        self.dtype = np.dtype(STORAGE_DTYPES[cfg.local_memory_dtype])
+        self.store = SegmentStore(workspace_path, cfg.memory_index, self.dtype)
+        self.index = None
+        if cfg.local_memory_ivf_lists > 0:
+            self.index = IVFIndex(
+                workspace_path,
+                cfg.memory_index,
+                cfg.local_memory_ivf_lists,
+                cfg.local_memory_ivf_probes,
+            )
+
+        if cfg.wipe_local_memory_on_start:
+            self.store.clear()
+            self.data = CacheContent(dtype=self.dtype)
+            self._clear_index()
+        else:
+            self.data = self.store.load()
+            if self.index is not None:
+                self.index.load(self.data)
+        self._hashes = None
 
     def add(self, text: str):
         """
@@ -61,34 +751,80 @@ class LocalCache(MemoryProviderSingleton):
         """
         if "Command Error:" in text:
             return ""
-        self.data.texts.append(text)
+        digest = bytes.fromhex(content_hash(text))
+        if digest in self.hashes:
+            logger.debug(f"Skipping text that is already in memory: {text[:50]}")
+            return ""
 
         embedding = get_ada_embedding(text)
 
         vector = np.array(embedding).astype(np.float32)
-        vector = vector[np.newaxis, :]
-        self.data.embeddings = np.concatenate(
-            [
-                self.data.embeddings,
-                vector,
-            ],
-            axis=0,
-        )
-
-        with open(self.filename, "wb") as f:
-            out = orjson.dumps(self.data, option=SAVE_OPTIONS)
-            f.write(out)
+        self._append([text], vector[np.newaxis, :])
         return text
 
+    def add_many(self, texts: List[str]) -> List[str]:
+        """
+        Add several texts, embedding them together and appending them to the
+            segment files in a single write
+
+        Args:
+            texts: List[str]
+
+        Returns: For each text, the text if it was added or "" if it was skipped
+        """
+        results = [""] * len(texts)
+        seen = set(self.hashes)
+        for i, text in enumerate(texts):
+            if "Command Error:" in text:
+                continue
+            digest = bytes.fromhex(content_hash(text))
+            if digest in seen:
+                logger.debug(f"Skipping text that is already in memory: {text[:50]}")
+                continue
+            seen.add(digest)
+            results[i] = text
+
+        new_texts = [text for text in results if text]
+        if new_texts:
+            vectors = np.array(get_ada_embeddings(new_texts)).astype(np.float32)
+            self._append(new_texts, vectors)
+        return results
+
+    def _append(self, texts: List[str], vectors: np.ndarray) -> None:
+        for text, vector in zip(texts, vectors):
+            self.data.append(text, vector)
+        self.store.append(texts, vectors)
+        if self.index is not None:
+            self.index.update(self.data)
+        self.hashes.update(bytes.fromhex(content_hash(text)) for text in texts)
+
     def clear(self) -> str:
         """
-        Clears the data in memory.
+        Clears the data in memory and on disk.
 
         Returns: A message indicating that the memory has been cleared.
         """
-        self.data = CacheContent()
+        self.data = CacheContent(dtype=self.dtype)
+        self.store.clear()
+        self._clear_index()
+        self._hashes = set()
         return "Obliviated"
 
+    def _clear_index(self) -> None:
+        # The files of an index that is disabled in this run must go too, a later
+        # run with the index enabled would reuse assignments of the deleted rows
+        if self.index is not None:
+            self.index.clear()
+        else:
+            IVFIndex.delete_files(self.workspace_path, self.memory_index)
+
+    @property
+    def hashes(self) -> set[bytes]:
+        """The content hashes of the stored texts, loaded on first use"""
+        if self._hashes is None:
+            self._hashes = self.store.load_hashes()
+        return self._hashes
+
     def get(self, data: str) -> list[Any] | None:
         """
         Gets the data from the memory that is most relevant to the given data.
@@ -111,16 +847,57 @@ class LocalCache(MemoryProviderSingleton):
 
         Returns: List[str]
         """
-        embedding = get_ada_embedding(text)
+        embedding = np.array(get_ada_embedding(text), dtype=EMBED_DTYPE)
+
+        if self.index is not None and self.index.trained:
+            indices = self.index.search(self.data, embedding, self._num_candidates(k))
+        else:
+            indices = top_k_indices(
+                self.data.scores(embedding), self._num_candidates(k)
+            )
 
-        scores = np.dot(self.data.embeddings, embedding)
+        indices = self._rescore(indices, embedding, k)
+        return [self.data.texts[i] for i in indices]
 
-        top_k_indices = np.argsort(scores)[-k:][::-1]
+    def get_relevant_batch(self, texts: List[str], k: int) -> list[list[Any]]:
+        """
+        Find the top-k texts for several queries with a single embeddings request
+        and a single matrix-matrix product.
+
+        Args:
+            texts: The queries
+            k: The number of texts to return per query
 
-        return [self.data.texts[i] for i in top_k_indices]
+        Returns: A list of the top-k texts for each query
+        """
+        if not texts:
+            return []
+        embeddings = np.array(get_ada_embeddings(texts), dtype=EMBED_DTYPE)
+
+        num_candidates = self._num_candidates(k)
+        if self.index is not None and self.index.trained:
+            batch_indices = [
+                self.index.search(self.data, embedding, num_candidates)
+                for embedding in embeddings
+            ]
+        else:
+            batch_indices = top_k_indices(self.data.scores(embeddings), num_candidates)
+
+        return [
+            [self.data.texts[i] for i in self._rescore(indices, embedding, k)]
+            for indices, embedding in zip(batch_indices, embeddings)
+        ]
+
+    def _num_candidates(self, k: int) -> int:
+        return k * RESCORE_FACTOR if self.data.quantized else k
+
+    def _rescore(self, indices: np.ndarray, embedding: np.ndarray, k: int):
+        if not self.data.quantized:
+            return indices
+        return rescore(indices, embedding, k, self.store.full_embeddings())
 
     def get_stats(self) -> tuple[int, tuple[int, ...]]:
         """
         Returns: The stats of the local cache.
         """
-        return len(self.data.texts), self.data.embeddings.shape
+        return len(self.data.texts), self.data.shape
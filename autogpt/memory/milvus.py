@@ -4,7 +4,7 @@ import re
 from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, connections
 
 from autogpt.config import Config
-from autogpt.llm import get_ada_embedding
+from autogpt.llm import get_ada_embedding, get_ada_embeddings
 from autogpt.memory.base import MemoryProviderSingleton
 
 
@@ -107,6 +107,24 @@ class MilvusMemory(MemoryProviderSingleton):
         )
         return _text
 
+    def add_many(self, data_list: list[str]) -> list[str]:
+        """Add the embeddings of several texts into memory in one insert.
+
+        Args:
+            data_list (list[str]): The raw texts to construct embedding indexes.
+
+        Returns:
+            list[str]: logs.
+        """
+        if not data_list:
+            return []
+        embeddings = get_ada_embeddings(data_list)
+        result = self.collection.insert([embeddings, list(data_list)])
+        return [
+            f"Inserting data into memory at primary key: {key}:\n data: {data}"
+            for key, data in zip(result.primary_keys, data_list)
+        ]
+
     def get(self, data):
         """Return the most relevant data in memory.
         Args:
@@ -33,6 +33,17 @@ class NoMemory(MemoryProviderSingleton):
         """
         return ""
 
+    def add_many(self, data_list: list[str]) -> list[str]:
+        """
+        Adds several data points to the memory. No action is taken in NoMemory.
+
+        Args:
+            data_list: The data to add.
+
+        Returns: An empty string for every data point.
+        """
+        return [""] * len(data_list)
+
     def get(self, data: str) -> list[Any] | None:
         """
         Gets the data from the memory that is most relevant to the given data.
@@ -1,10 +1,13 @@
 import pinecone
 from colorama import Fore, Style
 
-from autogpt.llm import get_ada_embedding
+from autogpt.llm import get_ada_embedding, get_ada_embeddings
 from autogpt.logs import logger
 from autogpt.memory.base import MemoryProviderSingleton
 
+# Pinecone recommends upserting at most 100 vectors per request
+UPSERT_BATCH_SIZE = 100
+
 
 class PineconeMemory(MemoryProviderSingleton):
     def __init__(self, cfg):
@@ -54,6 +57,20 @@ class PineconeMemory(MemoryProviderSingleton):
         self.vec_num += 1
         return _text
 
+    def add_many(self, data_list):
+        vectors = get_ada_embeddings(data_list)
+        items = []
+        results = []
+        for data, vector in zip(data_list, vectors):
+            items.append((str(self.vec_num), vector, {"raw_text": data}))
+            results.append(
+                f"Inserting data into memory at index: {self.vec_num}:\n data: {data}"
+            )
+            self.vec_num += 1
+        for start in range(0, len(items), UPSERT_BATCH_SIZE):
+            self.index.upsert(items[start : start + UPSERT_BATCH_SIZE])
+        return results
+
     def get(self, data):
         return self.get_relevant(data, 1)
 
@@ -10,9 +10,9 @@ from redis.commands.search.field import TextField, VectorField
 from redis.commands.search.indexDefinition import IndexDefinition, IndexType
 from redis.commands.search.query import Query
 
-from autogpt.llm import get_ada_embedding
+from autogpt.llm import get_ada_embedding, get_ada_embeddings
 from autogpt.logs import logger
-from autogpt.memory.base import MemoryProviderSingleton
+from autogpt.memory.base import MemoryProviderSingleton, content_hash
 
 SCHEMA = [
     TextField("data"),
@@ -88,11 +88,15 @@ class RedisMemory(MemoryProviderSingleton):
         """
         if "Command Error:" in data:
             return ""
+        digest = content_hash(data)
+        if self.redis.sismember(f"{self.cfg.memory_index}-hashes", digest):
+            return f"Data is already in memory:\ndata: {data}"
         vector = get_ada_embedding(data)
         vector = np.array(vector).astype(np.float32).tobytes()
         data_dict = {b"data": data, "embedding": vector}
         pipe = self.redis.pipeline()
         pipe.hset(f"{self.cfg.memory_index}:{self.vec_num}", mapping=data_dict)
+        pipe.sadd(f"{self.cfg.memory_index}-hashes", digest)
         _text = (
             f"Inserting data into memory at index: {self.vec_num}:\n" f"data: {data}"
         )
@@ -101,6 +105,52 @@ class RedisMemory(MemoryProviderSingleton):
         pipe.execute()
         return _text
 
+    def add_many(self, data_list: list[str]) -> list[str]:
+        """
+        Adds several data points to the memory, embedding them in one request.
+
+        Args:
+            data_list: The data to add.
+
+        Returns: A message for every data point, empty for those not added.
+        """
+        hashes_key = f"{self.cfg.memory_index}-hashes"
+        digests = [content_hash(data) for data in data_list]
+        pipe = self.redis.pipeline()
+        for digest in digests:
+            pipe.sismember(hashes_key, digest)
+        stored = pipe.execute()
+
+        results = [""] * len(data_list)
+        new_indices = []
+        seen = set()
+        for i, (data, digest) in enumerate(zip(data_list, digests)):
+            if "Command Error:" in data:
+                continue
+            if stored[i] or digest in seen:
+                results[i] = f"Data is already in memory:\ndata: {data}"
+                continue
+            seen.add(digest)
+            new_indices.append(i)
+        if not new_indices:
+            return results
+
+        vectors = get_ada_embeddings([data_list[i] for i in new_indices])
+        pipe = self.redis.pipeline()
+        for i, vector in zip(new_indices, vectors):
+            vector = np.array(vector).astype(np.float32).tobytes()
+            data_dict = {b"data": data_list[i], "embedding": vector}
+            pipe.hset(f"{self.cfg.memory_index}:{self.vec_num}", mapping=data_dict)
+            pipe.sadd(hashes_key, digests[i])
+            results[i] = (
+                f"Inserting data into memory at index: {self.vec_num}:\n"
+                f"data: {data_list[i]}"
+            )
+            self.vec_num += 1
+        pipe.set(f"{self.cfg.memory_index}-vec_num", self.vec_num)
+        pipe.execute()
+        return results
+
     def get(self, data: str) -> list[Any] | None:
         """
         Gets the data from the memory that is most relevant to the given data.
@@ -3,7 +3,7 @@ from weaviate import Client
 from weaviate.embedded import EmbeddedOptions
 from weaviate.util import generate_uuid5
 
-from autogpt.llm import get_ada_embedding
+from autogpt.llm import get_ada_embedding, get_ada_embeddings
 from autogpt.logs import logger
 from autogpt.memory.base import MemoryProviderSingleton
 
@@ -86,6 +86,23 @@ class WeaviateMemory(MemoryProviderSingleton):
 
         return f"Inserting data into memory at uuid: {doc_uuid}:\n data: {data}"
 
+    def add_many(self, data_list):
+        vectors = get_ada_embeddings(data_list)
+        results = []
+        with self.client.batch as batch:
+            for data, vector in zip(data_list, vectors):
+                doc_uuid = generate_uuid5(data, self.index)
+                batch.add_data_object(
+                    uuid=doc_uuid,
+                    data_object={"raw_text": data},
+                    class_name=self.index,
+                    vector=vector,
+                )
+                results.append(
+                    f"Inserting data into memory at uuid: {doc_uuid}:\n data: {data}"
+                )
+        return results
+
     def get(self, data):
         return self.get_relevant(data, 1)
 
@@ -1,74 +1,65 @@
+from __future__ import annotations
+
 import copy
 import json
-from typing import Dict, List, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 
-from autogpt.agent import Agent
 from autogpt.config import Config
 from autogpt.llm.llm_utils import create_chat_completion
+from autogpt.llm.message_history import MessageHistory
+from autogpt.llm.token_counter import count_string_tokens
 from autogpt.log_cycle.log_cycle import PROMPT_SUMMARY_FILE_NAME, SUMMARY_FILE_NAME
 from autogpt.logs import logger
 
+if TYPE_CHECKING:
+    from autogpt.agent import Agent
+
 cfg = Config()
 
 
 def get_newly_trimmed_messages(
-    full_message_history: List[Dict[str, str]],
-    current_context: List[Dict[str, str]],
-    last_memory_index: int,
+    full_message_history: MessageHistory,
+    first_context_index: int,
+    trimmed_until_id: int,
 ) -> Tuple[List[Dict[str, str]], int]:
     """
-    This function returns a list of dictionaries contained in full_message_history
-    with an index higher than prev_index that are absent from current_context.
+    This function returns the messages of full_message_history that were trimmed
+    from the context since the last call, i.e. the messages between the ones
+    returned before and the first message in the context.
 
     Args:
-        full_message_history (list): A list of dictionaries representing the full message history.
-        current_context (list): A list of dictionaries representing the current context.
-        last_memory_index (int): An integer representing the previous index.
+        full_message_history (MessageHistory): The full message history.
+        first_context_index (int): The index in full_message_history of the oldest
+            message in the current context.
+        trimmed_until_id (int): The ID of the first message that was not returned
+            yet, as returned by the previous call.
 
     Returns:
-        list: A list of dictionaries that are in full_message_history with an index higher than last_memory_index and absent from current_context.
-        int: The new index value for use in the next loop.
+        list: The messages newly trimmed from the context.
+        int: The new ID value for use in the next loop.
     """
-    # Select messages in full_message_history with an index higher than last_memory_index
-    new_messages = [
-        msg for i, msg in enumerate(full_message_history) if i > last_memory_index
-    ]
-
-    # Remove messages that are already present in current_context
-    new_messages_not_in_context = [
-        msg for msg in new_messages if msg not in current_context
-    ]
-
-    # Find the index of the last message processed
-    new_index = last_memory_index
-    if new_messages_not_in_context:
-        last_message = new_messages_not_in_context[-1]
-        new_index = full_message_history.index(last_message)
-
-    return new_messages_not_in_context, new_index
+    first_context_id = full_message_history.get_id(first_context_index)
+    # Messages trimmed before they could be summarized may have been spilled to disk
+    new_messages = full_message_history.get_messages(trimmed_until_id, first_context_id)
+    return new_messages, max(trimmed_until_id, first_context_id)
 
 
-def update_running_summary(
-    agent: Agent, current_memory: str, new_events: List[Dict[str, str]]
-) -> str:
+def format_events(new_events: List[Dict[str, str]]) -> List[Dict[str, str]]:
     """
-    This function takes a list of dictionaries representing new events and combines them with the current summary,
-    focusing on key and potentially important information to remember. The updated summary is returned in a message
-    formatted in the 1st person past tense.
+    Prepare messages to be summarized: the assistant becomes "you", the system
+    becomes "your computer", and user messages and thoughts are left out.
 
     Args:
-        new_events (List[Dict]): A list of dictionaries containing the latest events to be added to the summary.
+        new_events (List[Dict]): The messages to prepare.
 
     Returns:
-        str: A message containing the updated summary of actions, formatted in the 1st person past tense.
-
-    Example:
-        new_events = [{"event": "entered the kitchen."}, {"event": "found a scrawled note with the number 7"}]
-        update_running_summary(new_events)
-        # Returns: "This reminds you of these events from your past: \nI entered the kitchen and found a scrawled note saying 7."
+        List[Dict]: Copies of the messages to summarize.
     """
     # Create a copy of the new_events list to prevent modifying the original list
     new_events = copy.deepcopy(new_events)
+    formatted_events = []
 
     # Replace "assistant" with "you". This produces much better first person past tense results.
     for event in new_events:
@@ -90,12 +81,27 @@ def update_running_summary(
 
         # Delete all user messages
         elif event["role"] == "user":
-            new_events.remove(event)
+            continue
 
-    # This can happen at any point during execution, not just the beginning
-    if len(new_events) == 0:
-        new_events = "Nothing new happened."
+        formatted_events.append(event)
 
+    return formatted_events
+
+
+def summary_request(
+    current_memory: str, new_events: List[Dict[str, str]]
+) -> List[Dict[str, str]]:
+    """
+    Build the request that combines events prepared by format_events with the
+    current summary.
+
+    Args:
+        current_memory (str): The summary so far.
+        new_events (List[Dict]): The events to add to the summary.
+
+    Returns:
+        List[Dict]: The messages to send to the chat completion.
+    """
     prompt = f'''Your task is to create a concise running summary of actions and information results in the provided text, focusing on key and potentially important information to remember.
 
 You will receive the current summary and the your latest actions. Combine them, adding relevant key information from the latest development in 1st person past tense and keeping the summary concise.
@@ -111,33 +117,167 @@ Latest Development:
 """
 '''
 
-    messages = [
+    return [
         {
             "role": "user",
             "content": prompt,
         }
     ]
+
+
+def log_summary_cycle(agent: Agent, cycle_count: int, data, file_name: str) -> None:
+    """Log a summary request or its response in a cycle of the agent"""
     agent.log_cycle_handler.log_cycle(
-        agent.config.ai_name,
-        agent.created_at,
-        agent.cycle_count,
-        messages,
-        PROMPT_SUMMARY_FILE_NAME,
+        agent.config.ai_name, agent.created_at, cycle_count, data, file_name
     )
 
+
+def summarize_events(
+    agent: Agent, current_memory: str, new_events: List[Dict[str, str]]
+) -> str:
+    """
+    Combine events prepared by format_events with the current summary.
+
+    Args:
+        agent (Agent): The agent whose cycle the request is logged in.
+        current_memory (str): The summary so far.
+        new_events (List[Dict]): The events to add to the summary.
+
+    Returns:
+        str: The updated summary, in the 1st person past tense.
+    """
+    messages = summary_request(current_memory, new_events)
+    log_summary_cycle(agent, agent.cycle_count, messages, PROMPT_SUMMARY_FILE_NAME)
+
     current_memory = create_chat_completion(messages, cfg.fast_llm_model)
 
-    agent.log_cycle_handler.log_cycle(
-        agent.config.ai_name,
-        agent.created_at,
-        agent.cycle_count,
-        current_memory,
-        SUMMARY_FILE_NAME,
-    )
+    log_summary_cycle(agent, agent.cycle_count, current_memory, SUMMARY_FILE_NAME)
+    return current_memory
 
-    message_to_return = {
+
+def summary_message(summary: str) -> Dict[str, str]:
+    """Return the message that gives a summary to the assistant"""
+    return {
         "role": "system",
-        "content": f"This reminds you of these events from your past: \n{current_memory}",
+        "content": f"This reminds you of these events from your past: \n{summary}",
     }
 
-    return message_to_return
+
+class SummaryMemory:
+    """
+    The running summary of the messages trimmed from the context of an agent.
+
+    Trimmed messages are held back until they add up to min_tokens tokens, and are
+    then summarized together in a single request, so that most cycles of the agent
+    do not wait for a summary.
+
+    In background mode, the request runs in a worker thread while the agent goes on
+    with the previous summary. A cycle only waits for it once it has been running
+    for more than max_staleness cycles.
+    """
+
+    def __init__(
+        self,
+        summary: str,
+        min_tokens: Optional[int] = None,
+        background: Optional[bool] = None,
+        max_staleness: Optional[int] = None,
+    ) -> None:
+        self.summary = summary
+        self.min_tokens = (
+            cfg.summary_memory_min_tokens if min_tokens is None else min_tokens
+        )
+        self.background = (
+            cfg.summary_memory_background if background is None else background
+        )
+        self.max_staleness = (
+            cfg.summary_memory_max_staleness if max_staleness is None else max_staleness
+        )
+        self.pending_events: List[Dict[str, str]] = []
+        self.pending_tokens = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._future: Optional[Future] = None
+        # Logs the response of the background request in the cycle it was sent in
+        self._log_future: Optional[Callable[[str], None]] = None
+        # Number of cycles the background request has been running for
+        self._future_age = 0
+
+    @property
+    def message(self) -> Dict[str, str]:
+        """The message that gives the summary to the assistant"""
+        return summary_message(self.summary)
+
+    def __str__(self) -> str:
+        return self.message["content"]
+
+    def update(self, agent: Agent, new_events: List[Dict[str, str]]) -> bool:
+        """
+        Add messages trimmed from the context, and summarize the pending ones if
+        there are enough of them.
+
+        Args:
+            agent (Agent): The agent whose cycle the summary request is logged in.
+            new_events (List[Dict]): The newly trimmed messages.
+
+        Returns:
+            bool: Whether the summary was updated.
+        """
+        events = format_events(new_events)
+        self.pending_events += events
+        self.pending_tokens += sum(
+            count_string_tokens(event["content"], cfg.fast_llm_model)
+            for event in events
+        )
+
+        updated = False
+        if self._future is not None:
+            self._future_age += 1
+            if self._future.done() or self._future_age > self.max_staleness:
+                updated = self.wait()
+
+        if (
+            not self.pending_events
+            or self.pending_tokens < self.min_tokens
+            or self._future is not None
+        ):
+            return updated
+
+        events = self.pending_events
+        self.pending_events = []
+        self.pending_tokens = 0
+        if not self.background:
+            self.summary = summarize_events(agent, self.summary, events)
+            return True
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="summary_memory"
+            )
+        # Only the request runs in the worker thread, the agent and its cycle logs
+        # are only used from the thread of the agent
+        messages = summary_request(self.summary, events)
+        cycle_count = agent.cycle_count
+        log_summary_cycle(agent, cycle_count, messages, PROMPT_SUMMARY_FILE_NAME)
+        self._future = self._executor.submit(
+            create_chat_completion, messages, cfg.fast_llm_model
+        )
+        self._log_future = partial(
+            log_summary_cycle, agent, cycle_count, file_name=SUMMARY_FILE_NAME
+        )
+        self._future_age = 0
+        return updated
+
+    def wait(self) -> bool:
+        """
+        Wait for the summary being computed in the background, if there is one.
+
+        Returns:
+            bool: Whether the summary was updated.
+        """
+        if self._future is None:
+            return False
+        future = self._future
+        self._future = None
+        self.summary = future.result()
+        self._log_future(self.summary)
+        return True
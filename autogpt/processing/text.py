@@ -1,17 +1,39 @@
 """Text processing functions"""
-from typing import Dict, Generator, Optional
+import asyncio
+import functools
+from typing import Dict, Generator, List, Optional
 
 import spacy
 from selenium.webdriver.remote.webdriver import WebDriver
 
 from autogpt.config import Config
-from autogpt.llm import count_message_tokens, create_chat_completion
+from autogpt.llm import (
+    acreate_chat_completion,
+    count_message_tokens,
+    count_string_tokens,
+)
+from autogpt.llm.async_session import close_shared_session
 from autogpt.logs import logger
 from autogpt.memory import get_memory
 
 CFG = Config()
 
 
+@functools.lru_cache(maxsize=None)
+def get_sentencizer(model_name: str) -> spacy.Language:
+    """Load a spaCy pipeline that splits text into sentences, only once per model
+
+    Args:
+        model_name (str): The name of the spaCy language model
+
+    Returns:
+        spacy.Language: The pipeline
+    """
+    nlp = spacy.load(model_name)
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
 def split_text(
     text: str,
     max_length: int = CFG.browse_chunk_max_length,
@@ -20,6 +42,9 @@ def split_text(
 ) -> Generator[str, None, None]:
     """Split text into chunks of a maximum length
 
+    The sentences are counted once each, and packed into chunks with a running
+    count of the tokens of the chunk.
+
     Args:
         text (str): The text to split
         max_length (int, optional): The maximum length of each chunk. Defaults to 8192.
@@ -31,38 +56,35 @@ def split_text(
         ValueError: If the text is longer than the maximum length
     """
     flattened_paragraphs = " ".join(text.split("\n"))
-    nlp = spacy.load(CFG.browse_spacy_language_model)
-    nlp.add_pipe("sentencizer")
+    nlp = get_sentencizer(CFG.browse_spacy_language_model)
     doc = nlp(flattened_paragraphs)
     sentences = [sent.text.strip() for sent in doc.sents]
 
+    # The tokens of the message wrapping the chunk, +1 as a margin
+    message_tokens = (
+        count_message_tokens(messages=[create_message("", question)], model=model) + 1
+    )
+
     current_chunk = []
+    current_tokens = message_tokens
 
     for sentence in sentences:
-        message_with_additional_sentence = [
-            create_message(" ".join(current_chunk) + " " + sentence, question)
-        ]
-
-        expected_token_usage = (
-            count_message_tokens(messages=message_with_additional_sentence, model=model)
-            + 1
-        )
-        if expected_token_usage <= max_length:
+        # +1 for the space joining the sentence to the previous one
+        sentence_tokens = count_string_tokens(sentence, model) + 1
+        if current_tokens + sentence_tokens <= max_length:
             current_chunk.append(sentence)
-        else:
-            yield " ".join(current_chunk)
-            current_chunk = [sentence]
-            message_this_sentence_only = [
-                create_message(" ".join(current_chunk), question)
-            ]
-            expected_token_usage = (
-                count_message_tokens(messages=message_this_sentence_only, model=model)
-                + 1
+            current_tokens += sentence_tokens
+            continue
+
+        if message_tokens + sentence_tokens > max_length:
+            raise ValueError(
+                "Sentence is too long in webpage:"
+                f" {message_tokens + sentence_tokens} tokens."
             )
-            if expected_token_usage > max_length:
-                raise ValueError(
-                    f"Sentence is too long in webpage: {expected_token_usage} tokens."
-                )
+        if current_chunk:
+            yield " ".join(current_chunk)
+        current_chunk = [sentence]
+        current_tokens = message_tokens + sentence_tokens
 
     if current_chunk:
         yield " ".join(current_chunk)
@@ -73,6 +95,11 @@ def summarize_text(
 ) -> str:
     """Summarize text using the OpenAI API
 
+    The chunks of the text are summarized concurrently, by up to
+    CFG.browse_summary_workers requests at a time, while they are added to memory.
+    Their summaries are then summarized in groups that fit in a request, level
+    after level, until they fit in the request for the final summary.
+
     Args:
         url (str): The url of the text
         text (str): The text to summarize
@@ -85,56 +112,172 @@ def summarize_text(
     if not text:
         return "Error: No text to summarize"
 
-    model = CFG.fast_llm_model
     text_length = len(text)
     logger.info(f"Text length: {text_length} characters")
 
-    summaries = []
     chunks = list(
         split_text(
-            text, max_length=CFG.browse_chunk_max_length, model=model, question=question
+            text,
+            max_length=CFG.browse_chunk_max_length,
+            model=CFG.fast_llm_model,
+            question=question,
         ),
     )
-    scroll_ratio = 1 / len(chunks)
+    return asyncio.run(_summarize_chunks(url, chunks, question, driver))
 
-    for i, chunk in enumerate(chunks):
-        if driver:
-            scroll_to_percentage(driver, scroll_ratio * i)
-        logger.info(f"Adding chunk {i + 1} / {len(chunks)} to memory")
 
-        memory_to_add = f"Source: {url}\n" f"Raw content part#{i + 1}: {chunk}"
+async def _summarize_chunks(
+    url: str, chunks: List[str], question: str, driver: Optional[WebDriver]
+) -> str:
+    model = CFG.fast_llm_model
+    memory = get_memory(CFG)
+    scroll_ratio = 1 / len(chunks)
+    semaphore = asyncio.Semaphore(max(CFG.browse_summary_workers, 1))
+
+    async def summarize_chunk(i: int, chunk: str) -> str:
+        async with semaphore:
+            if driver:
+                scroll_to_percentage(driver, scroll_ratio * i)
 
-        memory = get_memory(CFG)
-        memory.add(memory_to_add)
+            messages = [create_message(chunk, question)]
+            tokens_for_chunk = count_message_tokens(messages, model)
+            logger.info(
+                f"Summarizing chunk {i + 1} / {len(chunks)} of length {len(chunk)} characters, or {tokens_for_chunk} tokens"
+            )
 
-        messages = [create_message(chunk, question)]
-        tokens_for_chunk = count_message_tokens(messages, model)
-        logger.info(
-            f"Summarizing chunk {i + 1} / {len(chunks)} of length {len(chunk)} characters, or {tokens_for_chunk} tokens"
+            summary = await acreate_chat_completion(
+                model=model,
+                messages=messages,
+            )
+            logger.info(
+                f"Summarized chunk {i + 1}, summary of length {len(summary)} characters"
+            )
+            return summary
+
+    try:
+        logger.info(f"Adding {len(chunks)} chunks to memory")
+        # The memory backends are synchronous, write to them in another thread
+        # while the chunks are summarized
+        _, *summaries = await asyncio.gather(
+            asyncio.to_thread(
+                memory.add_many,
+                [
+                    f"Source: {url}\n" f"Raw content part#{i + 1}: {chunk}"
+                    for i, chunk in enumerate(chunks)
+                ],
+            ),
+            *(summarize_chunk(i, chunk) for i, chunk in enumerate(chunks)),
         )
 
-        summary = create_chat_completion(
-            model=model,
-            messages=messages,
-        )
-        summaries.append(summary)
-        logger.info(
-            f"Added chunk {i + 1} summary to memory, of length {len(summary)} characters"
+        logger.info(f"Summarized {len(chunks)} chunks.")
+
+        async def summarize(text: str) -> str:
+            async with semaphore:
+                return await acreate_chat_completion(
+                    model=model,
+                    messages=[create_message(text, question)],
+                )
+
+        async def reduce_summaries(summaries: List[str]) -> str:
+            # Summarize the summaries in groups that fit in a request, level by
+            # level, until a single group is left for the final summary
+            level = 1
+            groups = group_summaries(
+                summaries, question, model, CFG.browse_chunk_max_length
+            )
+            while len(groups) > 1:
+                logger.info(
+                    f"Combining {len(summaries)} summaries into {len(groups)}"
+                    f" at level {level}"
+                )
+                summaries = await asyncio.gather(
+                    *(summarize("\n".join(group)) for group in groups)
+                )
+                groups = group_summaries(
+                    summaries, question, model, CFG.browse_chunk_max_length
+                )
+                level += 1
+
+            return await summarize("\n".join(groups[0]))
+
+        _, summary = await asyncio.gather(
+            asyncio.to_thread(
+                memory.add_many,
+                [
+                    f"Source: {url}\n" f"Content summary part#{i + 1}: {summary}"
+                    for i, summary in enumerate(summaries)
+                ],
+            ),
+            reduce_summaries(summaries),
         )
+        return summary
+    finally:
+        await close_shared_session()
 
-        memory_to_add = f"Source: {url}\n" f"Content summary part#{i + 1}: {summary}"
 
-        memory.add(memory_to_add)
+def truncate_text(text: str, max_tokens: int, model: str) -> str:
+    """Cut the end of a text so that it takes at most max_tokens tokens
 
-    logger.info(f"Summarized {len(chunks)} chunks.")
+    Args:
+        text (str): The text to truncate
+        max_tokens (int): The maximum length of the text in tokens
+        model (str): The model whose tokens are counted
 
-    combined_summary = "\n".join(summaries)
-    messages = [create_message(combined_summary, question)]
+    Returns:
+        str: The longest start of the text that fits
+    """
+    if count_string_tokens(text, model) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_string_tokens(text[:middle], model) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip()
 
-    return create_chat_completion(
-        model=model,
-        messages=messages,
-    )
+
+def group_summaries(
+    summaries: List[str],
+    question: str,
+    model: str,
+    max_length: int = CFG.browse_chunk_max_length,
+) -> List[List[str]]:
+    """Split summaries into consecutive groups that each fit in a summary request
+
+    Summaries longer than half of a request are truncated, so that any two of them
+    fit together: every group but the last one holds at least two summaries, and
+    each level of summaries is at most half as long as the previous.
+
+    Args:
+        summaries (List[str]): The summaries to group
+        question (str): The question asked in the summary requests
+        model (str): The model used for the summary requests
+        max_length (int, optional): The maximum length of a request in tokens.
+            Defaults to CFG.browse_chunk_max_length.
+
+    Returns:
+        List[List[str]]: The groups of summaries, with the long ones truncated
+    """
+    request_tokens = count_message_tokens([create_message("", question)], model) + 1
+    # +1 for the newline that joins the summaries of a group
+    max_summary_tokens = (max_length - request_tokens) // 2 - 1
+    groups = []
+    group = []
+    group_tokens = request_tokens
+    for summary in summaries:
+        summary = truncate_text(summary, max_summary_tokens, model)
+        summary_tokens = count_string_tokens(summary, model) + 1
+        if group and group_tokens + summary_tokens > max_length:
+            groups.append(group)
+            group = []
+            group_tokens = request_tokens
+        group.append(summary)
+        group_tokens += summary_tokens
+    if group:
+        groups.append(group)
+    return groups
 
 
 def scroll_to_percentage(driver: WebDriver, ratio: float) -> None:
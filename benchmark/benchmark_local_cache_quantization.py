@@ -0,0 +1,69 @@
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from autogpt.memory.local import (
+    EMBED_DIM,
+    RESCORE_FACTOR,
+    STORAGE_DTYPES,
+    SegmentStore,
+    rescore,
+    top_k_indices,
+)
+
+NUM_ROWS = 20_000
+NUM_QUERIES = 100
+NUM_CLUSTERS = 200
+K = 10
+
+
+def make_embeddings(rng, num_rows):
+    # Real embeddings are far from uniformly spread, so sample around clusters
+    centers = rng.normal(size=(NUM_CLUSTERS, EMBED_DIM))
+    vectors = centers[rng.integers(NUM_CLUSTERS, size=num_rows)]
+    vectors += rng.normal(scale=0.5, size=vectors.shape)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def benchmark_local_cache_quantization():
+    # Compare the top-k results of every storage dtype to those of float32.
+    rng = np.random.default_rng(0)
+    embeddings = make_embeddings(rng, NUM_ROWS + NUM_QUERIES)
+    rows, queries = embeddings[:NUM_ROWS], embeddings[NUM_ROWS:]
+    expected = top_k_indices(np.dot(queries, rows.T), K)
+
+    print(f"{NUM_ROWS} rows, {NUM_QUERIES} queries, recall@{K} versus float32")
+    print(f"{'dtype':>8} {'memory MB':>10} {'recall':>8} {'ms/query':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for name, dtype in STORAGE_DTYPES.items():
+            store = SegmentStore(Path(directory), name, dtype)
+            store.append([""] * NUM_ROWS, rows)
+            data = store.load()
+            full = store.full_embeddings()
+
+            start = time.perf_counter()
+            found = []
+            for query in queries:
+                indices = top_k_indices(data.scores(query), K * RESCORE_FACTOR)
+                if data.quantized:
+                    indices = rescore(indices, query, K, full)
+                found.append(indices[:K])
+            elapsed = time.perf_counter() - start
+
+            recall = np.mean(
+                [len(np.intersect1d(f, e)) / K for f, e in zip(found, expected)]
+            )
+            memory = data.mapped.nbytes
+            if data.mapped_scales is not None:
+                memory += data.mapped_scales.nbytes
+            print(
+                f"{name:>8} {memory / 2**20:>10.1f} {recall:>8.3f}"
+                f" {1000 * elapsed / NUM_QUERIES:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    benchmark_local_cache_quantization()
@@ -5,7 +5,7 @@ import pytest
 from pytest_mock import MockerFixture
 
 from autogpt.config import Config
-from autogpt.llm import ApiManager
+from autogpt.llm import ApiManager, llm_utils
 from autogpt.workspace import Workspace
 
 pytest_plugins = ["tests.integration.agent_factory"]
@@ -42,3 +42,12 @@ def api_manager() -> ApiManager:
     if ApiManager in ApiManager._instances:
         del ApiManager._instances[ApiManager]
     return ApiManager()
+
+
+@pytest.fixture(autouse=True)
+def reset_api_circuit_breaker():
+    # The circuit breaker is shared by all the API requests, don't let the failures
+    # of one test open it for the next ones
+    llm_utils.api_circuit_breaker.reset()
+    yield
+    llm_utils.api_circuit_breaker.reset()
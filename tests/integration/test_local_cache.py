@@ -1,12 +1,11 @@
 # sourcery skip: snake-case-functions
 """Tests for LocalCache class"""
-import unittest
-
-import orjson
+import numpy as np
 import pytest
 
-from autogpt.memory.local import EMBED_DIM, SAVE_OPTIONS
+from autogpt.memory.local import EMBED_DIM, CacheContent
 from autogpt.memory.local import LocalCache as LocalCache_
+from autogpt.memory.local import SegmentStore, top_k_indices
 from tests.utils import requires_api_key
 
 
@@ -20,44 +19,60 @@ def LocalCache():
 
 @pytest.fixture
 def mock_embed_with_ada(mocker):
-    mocker.patch(
+    return mocker.patch(
         "autogpt.memory.local.get_ada_embedding",
         return_value=[0.1] * EMBED_DIM,
     )
 
 
-def test_init_without_backing_file(LocalCache, config, workspace):
-    cache_file = workspace.root / f"{config.memory_index}.json"
+def test_init_without_backing_files(LocalCache, config, workspace):
+    store = SegmentStore(workspace.root, config.memory_index)
+    for file in store.files:
+        file.unlink()
 
-    assert not cache_file.exists()
     LocalCache(config)
-    assert cache_file.exists()
-    assert cache_file.read_text() == "{}"
+    for file in store.files:
+        assert file.exists()
+        assert file.read_bytes() == b""
 
 
-def test_init_with_backing_empty_file(LocalCache, config, workspace):
-    cache_file = workspace.root / f"{config.memory_index}.json"
-    cache_file.touch()
+def test_init_with_backing_files(LocalCache, config, workspace):
+    store = SegmentStore(workspace.root, config.memory_index)
+    store.append(["test"], np.ones((1, EMBED_DIM)))
+    assert len(store) == 1
 
-    assert cache_file.exists()
     LocalCache(config)
-    assert cache_file.exists()
-    assert cache_file.read_text() == "{}"
+    assert len(store) == 0
+    for file in store.files:
+        assert file.read_bytes() == b""
 
 
-def test_init_with_backing_file(LocalCache, config, workspace):
-    cache_file = workspace.root / f"{config.memory_index}.json"
-    cache_file.touch()
+def test_init_without_wipe_loads_backing_files(LocalCache, config, workspace, mocker):
+    mocker.patch.object(config, "wipe_local_memory_on_start", False)
+    store = SegmentStore(workspace.root, config.memory_index)
+    store.append(["first", "second"], np.eye(2, EMBED_DIM))
 
-    raw_data = {"texts": ["test"]}
-    data = orjson.dumps(raw_data, option=SAVE_OPTIONS)
-    with cache_file.open("wb") as f:
-        f.write(data)
+    cache = LocalCache(config)
+    assert isinstance(cache.data.embeddings, np.memmap)
+    assert len(cache.data.texts) == 2
+    assert cache.data.texts[1] == "second"
+    assert cache.get_stats() == (2, (2, EMBED_DIM))
 
-    assert cache_file.exists()
-    LocalCache(config)
-    assert cache_file.exists()
-    assert cache_file.read_text() == "{}"
+
+def test_add_after_warm_start(LocalCache, config, workspace, mocker):
+    mocker.patch.object(config, "wipe_local_memory_on_start", False)
+    store = SegmentStore(workspace.root, config.memory_index)
+    store.append(["first"], np.eye(1, EMBED_DIM))
+    mocker.patch(
+        "autogpt.memory.local.get_ada_embedding",
+        return_value=np.eye(1, EMBED_DIM, 1)[0].tolist(),
+    )
+
+    cache = LocalCache(config)
+    cache.add("second")
+    assert list(cache.data.texts) == ["first", "second"]
+    assert cache.get("second") == ["second"]
+    assert list(store.load().texts) == ["first", "second"]
 
 
 def test_add(LocalCache, config, mock_embed_with_ada):
@@ -108,3 +123,314 @@ def test_get_stats(LocalCache, config, mock_embed_with_ada) -> None:
     cache.add(text)
     stats = cache.get_stats()
     assert stats == (1, cache.data.embeddings.shape)
+
+
+def test_add_appends_to_store(LocalCache, config, workspace, mock_embed_with_ada):
+    cache = LocalCache(config)
+    cache.add("test")
+    cache.add("tést 2")
+
+    content = SegmentStore(workspace.root, config.memory_index).load()
+    assert isinstance(content.embeddings, np.memmap)
+    assert list(content.texts) == ["test", "tést 2"]
+    assert np.array_equal(content.embeddings, cache.data.embeddings)
+
+
+def test_clear_truncates_store(LocalCache, config, workspace, mock_embed_with_ada):
+    cache = LocalCache(config)
+    cache.add("test")
+    cache.clear()
+
+    store = SegmentStore(workspace.root, config.memory_index)
+    assert len(store) == 0
+    assert list(store.load().texts) == []
+
+
+def test_store_overwrites_partial_row(config, workspace):
+    store = SegmentStore(workspace.root, config.memory_index)
+    store.append(["first"], np.zeros((1, EMBED_DIM)))
+    with store.embeddings_file.open("ab") as f:
+        f.write(b"torn")
+    assert len(store) == 1
+
+    store.append(["second"], np.ones((1, EMBED_DIM)))
+    content = store.load()
+    assert list(content.texts) == ["first", "second"]
+    assert content.embeddings.shape == (2, EMBED_DIM)
+    assert content.embeddings[1].tolist() == [1.0] * EMBED_DIM
+
+
+def test_add_grows_buffer(LocalCache, config, mock_embed_with_ada):
+    cache = LocalCache(config)
+    for i in range(20):
+        cache.add(f"test {i}")
+
+    assert cache.data.size == 20
+    assert len(cache.data.buffer) == 32
+    assert cache.data.embeddings.shape == (20, EMBED_DIM)
+    assert cache.get_stats() == (20, (20, EMBED_DIM))
+
+
+def test_top_k_indices():
+    scores = np.random.default_rng(0).random((3, 100))
+
+    indices = top_k_indices(scores, 5)
+    assert indices.shape == (3, 5)
+    assert np.array_equal(indices, np.argsort(-scores, axis=-1)[:, :5])
+    assert top_k_indices(scores[0], 200).shape == (100,)
+    assert top_k_indices(scores[0], 0).shape == (0,)
+
+
+def test_get_relevant_batch(LocalCache, config, mocker):
+    embeddings = {f"text {i}": np.eye(1, EMBED_DIM, i)[0].tolist() for i in range(3)}
+    mocker.patch(
+        "autogpt.memory.local.get_ada_embedding", side_effect=embeddings.__getitem__
+    )
+    mock_embed_batch = mocker.patch(
+        "autogpt.memory.local.get_ada_embeddings",
+        side_effect=lambda texts: [embeddings[text] for text in texts],
+    )
+    cache = LocalCache(config)
+    for text in embeddings:
+        cache.add(text)
+
+    assert cache.get_relevant_batch(["text 2", "text 0"], 1) == [
+        ["text 2"],
+        ["text 0"],
+    ]
+    # the queries are embedded with a single request
+    assert mock_embed_batch.call_count == 1
+    assert mock_embed_batch.call_args.args[0] == ["text 2", "text 0"]
+    assert cache.get_relevant_batch(["text 1"], 1) == [cache.get_relevant("text 1", 1)]
+    assert cache.get_relevant_batch([], 1) == []
+
+
+@pytest.fixture
+def clustered_embeddings(mocker):
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(4, EMBED_DIM))
+    vectors = centers.repeat(50, axis=0) + rng.normal(scale=0.3, size=(200, EMBED_DIM))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    embeddings = {f"text {i}": vector.tolist() for i, vector in enumerate(vectors)}
+    mocker.patch(
+        "autogpt.memory.local.get_ada_embedding", side_effect=embeddings.__getitem__
+    )
+    mocker.patch(
+        "autogpt.memory.local.get_ada_embeddings",
+        side_effect=lambda texts: [embeddings[text] for text in texts],
+    )
+    return embeddings
+
+
+@pytest.fixture
+def ivf_config(config, mocker):
+    mocker.patch.object(config, "local_memory_ivf_lists", 4)
+    mocker.patch.object(config, "local_memory_ivf_probes", 4)
+    return config
+
+
+def test_ivf_index_is_trained_once_enough_rows(
+    LocalCache, ivf_config, clustered_embeddings
+):
+    cache = LocalCache(ivf_config)
+    texts = list(clustered_embeddings)
+    for text in texts[:155]:
+        cache.add(text)
+    assert not cache.index.trained
+
+    for text in texts[155:]:
+        cache.add(text)
+    assert cache.index.trained
+    assert cache.index.size == 200
+    assert sum(len(rows) for rows in cache.index.lists) == 200
+
+
+def test_ivf_index_assigns_rows_in_batches(
+    LocalCache, ivf_config, clustered_embeddings, mocker
+):
+    mocker.patch("autogpt.memory.local.IVF_ASSIGN_BATCH_SIZE", 16)
+    mocker.patch("autogpt.memory.local.IVF_TRAIN_ROWS_PER_LIST", 10)
+    take = mocker.spy(CacheContent, "take")
+    cache = LocalCache(ivf_config)
+    cache.add_many(list(clustered_embeddings))
+
+    assert cache.index.trained
+    assert max(len(call.args[1]) for call in take.call_args_list) <= 40
+    full = cache.store.full_embeddings()
+    expected = np.argmax(np.dot(full, cache.index.centroids.T), axis=1)
+    for list_number, rows in enumerate(cache.index.lists):
+        assert rows == np.flatnonzero(expected == list_number).tolist()
+
+
+def test_ivf_search_matches_brute_force_when_probing_all_lists(
+    LocalCache, ivf_config, clustered_embeddings
+):
+    cache = LocalCache(ivf_config)
+    for text in clustered_embeddings:
+        cache.add(text)
+
+    queries = ["text 3", "text 77", "text 199"]
+    scores = cache.data.scores(np.array([clustered_embeddings[q] for q in queries]))
+    expected = [[cache.data.texts[i] for i in row] for row in top_k_indices(scores, 5)]
+    assert cache.get_relevant_batch(queries, 5) == expected
+    assert cache.get_relevant("text 3", 5) == expected[0]
+
+
+def test_ivf_index_is_reloaded(LocalCache, ivf_config, clustered_embeddings, mocker):
+    cache = LocalCache(ivf_config)
+    for text in clustered_embeddings:
+        cache.add(text)
+    lists = cache.index.lists
+
+    mocker.patch.object(ivf_config, "wipe_local_memory_on_start", False)
+    del LocalCache._instances[LocalCache]
+    reloaded = LocalCache(ivf_config)
+    assert reloaded.index.trained
+    assert reloaded.index.lists == lists
+    assert reloaded.get_relevant("text 42", 3) == cache.get_relevant("text 42", 3)
+
+
+def test_wipe_without_ivf_index_deletes_its_files(
+    LocalCache, ivf_config, clustered_embeddings, mocker
+):
+    texts = list(clustered_embeddings)
+    cache = LocalCache(ivf_config)
+    cache.add_many(texts)
+    index_files = (cache.index.centroids_file, cache.index.assignments_file)
+    assert all(file.exists() for file in index_files)
+
+    mocker.patch.object(ivf_config, "local_memory_ivf_lists", 0)
+    del LocalCache._instances[LocalCache]
+    cache = LocalCache(ivf_config)
+    cache.add_many(texts[::-1])
+    assert not any(file.exists() for file in index_files)
+
+    mocker.patch.object(ivf_config, "local_memory_ivf_lists", 4)
+    mocker.patch.object(ivf_config, "wipe_local_memory_on_start", False)
+    del LocalCache._instances[LocalCache]
+    cache = LocalCache(ivf_config)
+    assert cache.index.trained
+    assert cache.get_relevant("text 42", 1) == ["text 42"]
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_storage(LocalCache, config, clustered_embeddings, mocker, dtype):
+    mocker.patch.object(config, "local_memory_dtype", dtype)
+    cache = LocalCache(config)
+    for text in clustered_embeddings:
+        cache.add(text)
+
+    assert cache.data.buffer.dtype == np.dtype(dtype)
+    assert cache.get_stats() == (200, (200, EMBED_DIM))
+    full = cache.store.full_embeddings()
+    assert np.allclose(cache.data.embeddings, full, atol=0.01)
+
+    queries = ["text 5", "text 105"]
+    scores = np.dot(np.array([clustered_embeddings[q] for q in queries]), full.T)
+    expected = [[cache.data.texts[i] for i in row] for row in top_k_indices(scores, 5)]
+    assert cache.get_relevant_batch(queries, 5) == expected
+    assert cache.get_relevant("text 5", 5) == expected[0]
+
+
+def test_int8_storage_with_ivf_index(
+    LocalCache, ivf_config, clustered_embeddings, mocker
+):
+    mocker.patch.object(ivf_config, "local_memory_dtype", "int8")
+    cache = LocalCache(ivf_config)
+    for text in clustered_embeddings:
+        cache.add(text)
+
+    assert cache.data.buffer.dtype == np.int8
+    assert cache.index.trained
+    assert cache.index.size == 200
+
+    queries = ["text 3", "text 77", "text 199"]
+    full = cache.store.full_embeddings()
+    scores = np.dot(np.array([clustered_embeddings[q] for q in queries]), full.T)
+    expected = [[cache.data.texts[i] for i in row] for row in top_k_indices(scores, 5)]
+    assert cache.get_relevant_batch(queries, 5) == expected
+    assert cache.get_relevant("text 3", 5) == expected[0]
+
+
+def test_quantized_warm_start_converts_existing_rows(
+    LocalCache, config, workspace, mocker
+):
+    store = SegmentStore(workspace.root, config.memory_index)
+    store.append(["first", "second"], np.eye(2, EMBED_DIM))
+    mocker.patch.object(config, "wipe_local_memory_on_start", False)
+    mocker.patch.object(config, "local_memory_dtype", "int8")
+    mocker.patch(
+        "autogpt.memory.local.get_ada_embedding",
+        return_value=np.eye(1, EMBED_DIM, 1)[0].tolist(),
+    )
+
+    cache = LocalCache(config)
+    assert isinstance(cache.data.mapped, np.memmap)
+    assert cache.data.mapped.dtype == np.int8
+    assert cache.data.mapped_scales.shape == (2,)
+    assert cache.get("second") == ["second"]
+
+
+def test_wipe_deletes_compact_rows_of_other_dtypes(
+    LocalCache, config, clustered_embeddings, mocker
+):
+    texts = list(clustered_embeddings)
+    mocker.patch.object(config, "local_memory_dtype", "int8")
+    cache = LocalCache(config)
+    cache.add_many(texts[:100])
+
+    mocker.patch.object(config, "local_memory_dtype", "float32")
+    del LocalCache._instances[LocalCache]
+    cache = LocalCache(config)
+    cache.add_many(texts[100:150])
+
+    mocker.patch.object(config, "local_memory_dtype", "int8")
+    mocker.patch.object(config, "wipe_local_memory_on_start", False)
+    del LocalCache._instances[LocalCache]
+    cache = LocalCache(config)
+    assert np.allclose(
+        cache.data.take(np.arange(50)), cache.store.full_embeddings(), atol=0.01
+    )
+    assert cache.get_relevant("text 120", 1) == ["text 120"]
+
+
+def test_add_skips_duplicate_texts(LocalCache, config, mock_embed_with_ada):
+    cache = LocalCache(config)
+    cache.add("test")
+    assert cache.add("test") == ""
+    cache.add("other")
+
+    assert mock_embed_with_ada.call_count == 2
+    assert list(cache.data.texts) == ["test", "other"]
+
+
+def test_add_skips_texts_stored_before_warm_start(
+    LocalCache, config, workspace, mocker, mock_embed_with_ada
+):
+    store = SegmentStore(workspace.root, config.memory_index)
+    store.append(["test"], np.ones((1, EMBED_DIM)))
+    store.hashes_file.unlink()
+    mocker.patch.object(config, "wipe_local_memory_on_start", False)
+
+    cache = LocalCache(config)
+    cache.add("test")
+
+    assert mock_embed_with_ada.call_count == 0
+    assert cache.get_stats()[0] == 1
+    assert store.hashes_file.stat().st_size == 32
+
+
+def test_add_many_embeds_texts_in_one_request(LocalCache, config, mocker):
+    mock_embed = mocker.patch(
+        "autogpt.memory.local.get_ada_embeddings",
+        side_effect=lambda texts: np.eye(len(texts), EMBED_DIM).tolist(),
+    )
+    cache = LocalCache(config)
+    cache.add_many(["test"])
+    results = cache.add_many(["first", "test", "Command Error: x", "first", "second"])
+
+    assert results == ["first", "", "", "", "second"]
+    assert mock_embed.call_count == 2
+    assert mock_embed.call_args.args[0] == ["first", "second"]
+    assert list(cache.data.texts) == ["test", "first", "second"]
+    assert cache.get_stats()[0] == 3
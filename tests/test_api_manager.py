@@ -1,8 +1,11 @@
 from unittest.mock import MagicMock, patch
 
 import pytest
+from openai.openai_object import OpenAIObject
 
 from autogpt.llm import COSTS, ApiManager
+from autogpt.llm.api_manager import RateLimiter, TokenBucket, estimate_tokens
+from autogpt.llm.modelsinfo import RATE_LIMITS
 
 api_manager = ApiManager()
 
@@ -89,6 +92,36 @@ class TestApiManager:
             assert api_manager.get_total_completion_tokens() == 20
             assert api_manager.get_total_cost() == (10 * 0.002 + 20 * 0.002) / 1000
 
+    @staticmethod
+    def test_stream_chat_completion():
+        """Test if streamed chunks are passed on and their tokens counted."""
+        messages = [{"role": "user", "content": "Who won the world series in 2020?"}]
+        model = "gpt-3.5-turbo"
+        events = [
+            {"choices": [{"delta": {"role": "assistant"}}]},
+            {"choices": [{"delta": {"content": "The Los Angeles"}}]},
+            {"choices": [{"delta": {"content": " Dodgers"}}]},
+            {"choices": [{"delta": {}}]},
+        ]
+        received = []
+
+        with patch("openai.ChatCompletion.create") as mock_create, patch(
+            "autogpt.llm.api_manager.count_message_tokens", return_value=10
+        ), patch("autogpt.llm.api_manager.count_string_tokens", return_value=20):
+            mock_create.return_value = iter(
+                OpenAIObject.construct_from(event) for event in events
+            )
+
+            reply = api_manager.stream_chat_completion(
+                messages, received.append, model=model
+            )
+
+        assert mock_create.call_args.kwargs["stream"] is True
+        assert reply == "The Los Angeles Dodgers"
+        assert received == ["The Los Angeles", " Dodgers"]
+        assert api_manager.get_total_prompt_tokens() == 10
+        assert api_manager.get_total_completion_tokens() == 20
+
     def test_getter_methods(self):
         """Test the getter methods for total tokens, cost, and budget."""
         api_manager.update_cost(60, 120, "gpt-3.5-turbo")
@@ -118,3 +151,62 @@ class TestApiManager:
         assert api_manager.get_total_prompt_tokens() == 50
         assert api_manager.get_total_completion_tokens() == 100
         assert api_manager.get_total_cost() == (50 * 0.002 + 100 * 0.002) / 1000
+
+
+class TestRateLimiter:
+    @staticmethod
+    def test_token_bucket_waits_for_refill():
+        """Test if reservations beyond the budget wait for it to refill, in order."""
+        with patch("time.monotonic", return_value=0.0):
+            bucket = TokenBucket(60)
+            assert bucket.reserve(50) == 0
+            assert bucket.reserve(20) == 10
+            assert bucket.reserve(10) == 20
+            # Reservations larger than the capacity only wait for a full bucket
+            assert bucket.reserve(1000) == 80
+
+        with patch("time.monotonic", return_value=140.0):
+            assert bucket.reserve(60) == 0
+
+    @staticmethod
+    def test_rate_limiter_waits_for_the_scarcer_budget():
+        """Test if a request waits for both its request and token budgets."""
+        with patch("time.monotonic", return_value=0.0):
+            limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=600)
+            assert limiter.reserve(100) == 0
+            assert limiter.reserve(500) == 0
+            assert limiter.reserve(1) == 30
+            limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+            assert limiter.reserve(300) == 0
+            assert limiter.reserve(600) == 30
+
+    @staticmethod
+    def test_estimate_tokens():
+        """Test if tokens are estimated from characters, or counted for chunks."""
+        assert estimate_tokens(["a" * 40, "b"], max_tokens=100) == 11 + 1 + 100
+        assert estimate_tokens([(1, 2, 3), [4]]) == 4
+
+    @staticmethod
+    def test_create_chat_completion_waits_for_rate_limit(mocker):
+        """Test if chat completions reserve their tokens before being sent."""
+        mocker.patch.dict(
+            RATE_LIMITS,
+            {"gpt-3.5-turbo": {"requests_per_minute": 1, "tokens_per_minute": 1000}},
+        )
+        mocker.patch.object(api_manager, "rate_limiters", {})
+        mock_sleep = mocker.patch("time.sleep")
+        messages = [{"role": "user", "content": "Hello"}]
+
+        with patch("openai.ChatCompletion.create") as mock_create:
+            mock_response = MagicMock()
+            del mock_response.error
+            mock_response.usage.prompt_tokens = 10
+            mock_response.usage.completion_tokens = 20
+            mock_create.return_value = mock_response
+
+            api_manager.create_chat_completion(messages, model="gpt-3.5-turbo")
+            mock_sleep.assert_not_called()
+            api_manager.create_chat_completion(messages, model="gpt-3.5-turbo")
+
+        assert mock_sleep.call_count == 1
+        assert 59 < mock_sleep.call_args.args[0] <= 60
@@ -1,6 +1,6 @@
 import pytest
 
-from autogpt.llm import count_message_tokens, count_string_tokens
+from autogpt.llm import count_message_tokens, count_string_tokens, token_counter
 
 
 def test_count_message_tokens():
@@ -70,3 +70,22 @@ def test_count_string_tokens_gpt_4():
 
     string = "Hello, world!"
     assert count_string_tokens(string, model_name="gpt-4-0314") == 4
+
+
+def test_count_message_tokens_is_cached_per_message(mocker):
+    encoding = mocker.Mock()
+    encoding.encode.side_effect = lambda text: text.split()
+    mocker.patch(
+        "autogpt.llm.token_counter.get_encoding_for_model", return_value=encoding
+    )
+    token_counter._count_single_message_tokens.cache_clear()
+    messages = [
+        {"role": "user", "content": "Hello there"},
+        {"role": "assistant", "content": "Hi"},
+    ]
+
+    assert count_message_tokens(messages, model="gpt-4") == 6 + 5 + 3
+    assert encoding.encode.call_count == 4
+    messages.append({"role": "user", "content": "How are you"})
+    assert count_message_tokens(messages, model="gpt-4") == 6 + 5 + 7 + 3
+    assert encoding.encode.call_count == 6
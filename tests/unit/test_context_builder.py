@@ -0,0 +1,75 @@
+import pytest
+
+from autogpt.llm import create_chat_message
+from autogpt.llm.context_builder import ContextBuilder
+from autogpt.llm.message_history import MessageHistory
+
+
+@pytest.fixture
+def count_message_tokens(mocker):
+    # Every message costs as many tokens as its content has words
+    return mocker.patch(
+        "autogpt.llm.context_builder.count_message_tokens",
+        side_effect=lambda messages, model: len(messages[0]["content"].split()),
+    )
+
+
+@pytest.fixture
+def history():
+    return [
+        create_chat_message("user", "one"),
+        create_chat_message("assistant", "two words"),
+        create_chat_message("user", "three more words"),
+    ]
+
+
+def test_first_fitting_message(count_message_tokens, history):
+    builder = ContextBuilder()
+    builder.update(history, "gpt-4")
+
+    assert builder.first_fitting_message(100) == 0
+    assert builder.first_fitting_message(6) == 0
+    assert builder.first_fitting_message(5) == 1
+    assert builder.first_fitting_message(3) == 2
+    assert builder.first_fitting_message(2) == 3
+    assert builder.first_fitting_message(-1) == 3
+    assert builder.tokens_since(1) == 5
+    assert builder.tokens_since(3) == 0
+
+
+def test_update_only_counts_new_messages(count_message_tokens, history):
+    builder = ContextBuilder()
+    builder.update(history, "gpt-4")
+    history.append(create_chat_message("assistant", "four"))
+    builder.update(history, "gpt-4")
+
+    assert count_message_tokens.call_count == 4
+    assert builder.first_fitting_message(1) == 3
+
+
+def test_update_recounts_changed_history(count_message_tokens, history):
+    builder = ContextBuilder()
+    builder.update(history, "gpt-4")
+    history[:] = history[1:] + [create_chat_message("assistant", "four")]
+    builder.update(history, "gpt-4")
+
+    assert count_message_tokens.call_count == 6
+    assert builder.tokens_since(0) == 6
+
+
+def test_update_removes_spilled_messages(count_message_tokens, history, tmp_path):
+    history = MessageHistory(
+        history, max_messages=4, spill_path=str(tmp_path / "history.jsonl")
+    )
+    builder = ContextBuilder()
+    builder.update(history, "gpt-4")
+
+    # 5 messages are more than 4, the 3 oldest ones are spilled
+    history.append(create_chat_message("assistant", "four"))
+    history.append(create_chat_message("user", "five words"))
+    assert history.first_id == 3
+    builder.update(history, "gpt-4")
+
+    assert count_message_tokens.call_count == 5
+    assert builder.cumulative_tokens == [0, 1, 3]
+    assert builder.first_fitting_message(2) == 1
@@ -0,0 +1,55 @@
+import pytest
+from openai.openai_object import OpenAIObject
+
+from autogpt.llm import llm_utils
+from autogpt.llm.embedding_cache import (
+    EMBEDDING_CACHE_FILE,
+    EmbeddingCache,
+    get_embedding_cache,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(tmp_path / EMBEDDING_CACHE_FILE, max_entries=2)
+    yield cache
+    cache.close()
+
+
+def test_get_returns_put_embedding(cache):
+    assert cache.get("model", "text") is None
+    cache.put("model", "text", [0.5, 0.25])
+
+    assert cache.get("model", "text") == [0.5, 0.25]
+    assert cache.get("model", "some  text\n") is None
+    assert cache.get("other model", "text") is None
+    assert cache.get("model", "  text\n") == [0.5, 0.25]
+
+
+def test_cache_persists_across_instances(cache):
+    cache.put("model", "text", [1.0])
+    cache.close()
+
+    reopened = EmbeddingCache(cache.path, max_entries=2)
+    assert len(reopened) == 1
+    assert reopened.get("model", "text") == [1.0]
+    reopened.close()
+
+
+def test_create_embedding_uses_cache(config, mocker):
+    mocker.patch.object(config, "embedding_cache_size", 10)
+    mocker.patch.object(llm_utils, "chunked_tokens", return_value=[(1, 2)])
+    mock_create = mocker.patch(
+        "openai.Embedding.create",
+        return_value=OpenAIObject.construct_from(
+            {
+                "data": [{"index": 0, "embedding": [3.0, 4.0]}],
+                "usage": {"prompt_tokens": 2},
+            }
+        ),
+    )
+
+    assert llm_utils.create_embedding("text") == pytest.approx([0.6, 0.8])
+    assert llm_utils.create_embedding("text") == pytest.approx([0.6, 0.8])
+    assert mock_create.call_count == 1
+    assert len(get_embedding_cache()) == 1
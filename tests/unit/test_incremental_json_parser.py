@@ -0,0 +1,36 @@
+from autogpt.json_utils.incremental import IncrementalJsonParser
+
+REPLY = (
+    '```json\n{\n  "thoughts": {"text": "a {brace} and a \\"quote\\"", "plan": ["x"]},\n'
+    '  "count": 3,\n  "command": {"name": "do", "args": {}}\n}\n```'
+)
+
+
+def test_members_are_parsed_as_soon_as_they_complete():
+    parser = IncrementalJsonParser()
+    thoughts_end = REPLY.index("},") + 1
+
+    assert parser.feed(REPLY[: thoughts_end - 1]) == []
+    assert parser.feed(REPLY[thoughts_end - 1 : thoughts_end]) == [
+        ("thoughts", {"text": 'a {brace} and a "quote"', "plan": ["x"]})
+    ]
+    completed = parser.feed(REPLY[thoughts_end:])
+    assert completed == [("count", 3), ("command", {"name": "do", "args": {}})]
+    assert parser.done
+
+
+def test_feeding_one_character_at_a_time():
+    parser = IncrementalJsonParser()
+    completed = []
+    for char in REPLY:
+        completed += parser.feed(char)
+
+    assert [key for key, _ in completed] == ["thoughts", "count", "command"]
+    assert parser.members["count"] == 3
+
+
+def test_invalid_members_are_skipped():
+    parser = IncrementalJsonParser()
+
+    assert parser.feed('{"a": nope, "b": [1]}') == [("b", [1])]
+    assert parser.members == {"b": [1]}
@@ -1,7 +1,12 @@
+import asyncio
+
+import openai
 import pytest
 from openai.error import APIError, RateLimitError
+from openai.openai_object import OpenAIObject
 
 from autogpt.llm import llm_utils
+from autogpt.llm.async_session import close_shared_session
 
 
 @pytest.fixture(params=[RateLimitError, APIError])
@@ -131,3 +136,119 @@ def test_chunked_tokens():
     ]
     output = list(llm_utils.chunked_tokens(text, "cl100k_base", 8191))
     assert output == expected_output
+
+
+def test_pack_chunks():
+    chunks = [(1, 2), (3,), (4, 5), (6,), (7, 8, 9, 10)]
+
+    assert list(llm_utils.pack_chunks(chunks, 3, 10)) == [
+        [(1, 2), (3,)],
+        [(4, 5), (6,)],
+        [(7, 8, 9, 10)],
+    ]
+    assert list(llm_utils.pack_chunks(chunks, 100, 2)) == [
+        [(1, 2), (3,)],
+        [(4, 5), (6,)],
+        [(7, 8, 9, 10)],
+    ]
+    assert list(llm_utils.pack_chunks([], 100, 2)) == []
+
+
+def test_get_ada_embeddings_batches_chunks(mocker):
+    mocker.patch.object(
+        llm_utils, "get_encoding"
+    ).return_value.encode = lambda text: text.split()
+    mocker.patch.object(llm_utils.Config(), "embedding_token_limit", 2)
+    mocker.patch.object(llm_utils, "EMBEDDING_BATCH_TOKENS", 3)
+
+    def create(input, **kwargs):
+        # Items are returned out of order to check they are sorted by index
+        data = [
+            {"index": i, "embedding": [1.0, 0.0] if len(chunk) == 2 else [0.0, 1.0]}
+            for i, chunk in reversed(list(enumerate(input)))
+        ]
+        return OpenAIObject.construct_from(
+            {"data": data, "usage": {"prompt_tokens": len(input)}}
+        )
+
+    mock_create = mocker.patch("openai.Embedding.create", side_effect=create)
+    embeddings = llm_utils.get_ada_embeddings(["a b c", "d"])
+
+    assert mock_create.call_count == 2
+    assert mock_create.call_args_list[0].kwargs["input"] == [("a", "b"), ("c",)]
+    assert mock_create.call_args_list[1].kwargs["input"] == [("d",)]
+    # the chunks are weighted by their number of tokens
+    assert embeddings[0] == pytest.approx([2 / 5**0.5, 1 / 5**0.5])
+    assert embeddings[1] == pytest.approx([0.0, 1.0])
+    assert llm_utils.get_ada_embeddings([]) == []
+
+
+@pytest.mark.asyncio
+async def test_retry_openai_api_async(error):
+    calls = []
+
+    @llm_utils.retry_openai_api(num_retries=2, backoff_base=0.001)
+    async def f():
+        calls.append(1)
+        if len(calls) <= 2:
+            raise error
+        return len(calls)
+
+    assert await f() == 3
+
+
+@pytest.mark.asyncio
+async def test_acreate_chat_completion_uses_shared_session(mocker):
+    sessions = []
+
+    async def acreate(**kwargs):
+        sessions.append(openai.aiosession.get())
+        return OpenAIObject.construct_from(
+            {
+                "choices": [{"message": {"content": "reply"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1},
+            }
+        )
+
+    mocker.patch("openai.ChatCompletion.acreate", side_effect=acreate)
+    messages = [{"role": "user", "content": "Hello"}]
+
+    replies = await asyncio.gather(
+        *(
+            llm_utils.acreate_chat_completion(messages, model="gpt-3.5-turbo")
+            for _ in range(3)
+        )
+    )
+    await close_shared_session()
+
+    assert replies == ["reply"] * 3
+    assert sessions[0] is not None
+    assert sessions.count(sessions[0]) == 3
+
+
+@pytest.mark.asyncio
+async def test_acreate_embeddings_sends_batches_concurrently(mocker):
+    mocker.patch.object(
+        llm_utils, "get_encoding"
+    ).return_value.encode = lambda text: text.split()
+    mocker.patch.object(llm_utils, "EMBEDDING_BATCH_SIZE", 1)
+    in_flight = []
+
+    async def acreate(input, **kwargs):
+        in_flight.append(input)
+        # Every request waits until all of them have been sent
+        while len(in_flight) < 2:
+            await asyncio.sleep(0)
+        return OpenAIObject.construct_from(
+            {
+                "data": [{"index": 0, "embedding": [0.0, float(len(input[0]))]}],
+                "usage": {"prompt_tokens": 1},
+            }
+        )
+
+    mocker.patch("openai.Embedding.acreate", side_effect=acreate)
+    embeddings = await llm_utils.acreate_embeddings(["a", "b c"])
+    await close_shared_session()
+
+    assert embeddings == [[0.0, 1.0], [0.0, 1.0]]
+    assert await llm_utils.acreate_embeddings([]) == []
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from autogpt.llm import create_chat_message
+from autogpt.llm.message_history import MessageHistory
+from autogpt.log_cycle.log_cycle import (
+    FULL_MESSAGE_HISTORY_FILE_NAME,
+    LogCycleHandler,
+    read_message_history,
+)
+from autogpt.logs import logger
+
+
+@pytest.fixture
+def log_directory(mocker, tmp_path):
+    mocker.patch.object(logger, "get_log_directory", return_value=str(tmp_path))
+    return tmp_path
+
+
+def test_log_new_messages_only_appends_new_messages(log_directory):
+    handler = LogCycleHandler()
+    history = MessageHistory(
+        max_messages=2, spill_path=str(log_directory / "history.jsonl")
+    )
+    log_path = os.path.join(
+        handler.get_outer_directory("Test AI", "20230101_000000"),
+        FULL_MESSAGE_HISTORY_FILE_NAME,
+    )
+
+    for cycle_count in range(1, 5):
+        handler.log_new_messages("Test AI", "20230101_000000", cycle_count, history)
+        history.append(create_chat_message("user", f"input {cycle_count}"))
+        history.append(create_chat_message("assistant", f"reply {cycle_count}"))
+
+    with open(log_path, encoding="utf-8") as log_file:
+        assert len(log_file.readlines()) == 6
+
+    assert read_message_history(log_path, 1) == []
+    assert read_message_history(log_path, 2) == [
+        create_chat_message("user", "input 1"),
+        create_chat_message("assistant", "reply 1"),
+    ]
+    assert len(read_message_history(log_path, 4)) == 6
+    assert read_message_history(log_path)[-1] == create_chat_message(
+        "assistant", "reply 3"
+    )
+
+
+def test_log_new_messages_starts_a_new_log(log_directory):
+    history = [create_chat_message("user", "hello")]
+    for _ in range(2):
+        handler = LogCycleHandler()
+        handler.log_new_messages("Test AI", "20230101_000000", 1, history)
+
+    log_path = os.path.join(
+        handler.get_outer_directory("Test AI", "20230101_000000"),
+        FULL_MESSAGE_HISTORY_FILE_NAME,
+    )
+    assert read_message_history(log_path) == history
+
+
+def test_log_new_messages_without_new_messages_writes_nothing(log_directory):
+    handler = LogCycleHandler()
+
+    handler.log_new_messages("Test AI", "20230101_000000", 1, MessageHistory())
+
+    assert not os.path.exists(handler.get_outer_directory("Test AI", "20230101_000000"))
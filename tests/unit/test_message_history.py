@@ -0,0 +1,62 @@
+import pytest
+
+from autogpt.llm import create_chat_message
+from autogpt.llm.message_history import MessageHistory
+
+
+@pytest.fixture
+def history(tmp_path):
+    return MessageHistory(
+        max_messages=4, spill_path=str(tmp_path / "logs" / "history.jsonl")
+    )
+
+
+def add_messages(history, count):
+    for i in range(count):
+        history.append(create_chat_message("user", f"message {history.next_id} ü"))
+
+
+def test_spills_oldest_messages(history):
+    add_messages(history, 4)
+    assert history.first_id == 0
+
+    add_messages(history, 1)
+    assert history.first_id == 3
+    assert [message["content"] for message in history] == [
+        "message 3 ü",
+        "message 4 ü",
+    ]
+
+    add_messages(history, 5)
+    assert history.first_id == 6
+    assert len(history) == 4
+    assert history.next_id == 10
+
+
+def test_reads_spilled_messages(history):
+    add_messages(history, 10)
+
+    assert history.get_message(1)["content"] == "message 1 ü"
+    assert history.get_message(9)["content"] == "message 9 ü"
+    assert [message["content"] for message in history.get_messages(2, 9)] == [
+        f"message {i} ü" for i in range(2, 9)
+    ]
+    assert len(list(history.iter_messages())) == 10
+    assert history.get_messages(10) == []
+
+
+def test_without_spill_path_keeps_all_messages():
+    history = MessageHistory(max_messages=4)
+    add_messages(history, 10)
+
+    assert len(history) == 10
+    assert history.first_id == 0
+
+
+def test_dropped_messages_cannot_be_read():
+    history = MessageHistory([create_chat_message("user", "hello")], first_id=5)
+
+    assert history.get_id(0) == 5
+    assert history.get_message(5)["content"] == "hello"
+    with pytest.raises(IndexError):
+        history.get_messages(2)
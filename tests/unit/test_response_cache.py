@@ -0,0 +1,72 @@
+import time
+
+import pytest
+from openai.openai_object import OpenAIObject
+
+from autogpt.llm import llm_utils
+from autogpt.llm.response_cache import RESPONSE_CACHE_FILE, ResponseCache, request_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(tmp_path / RESPONSE_CACHE_FILE, max_entries=2, ttl=60)
+    yield cache
+    cache.close()
+
+
+def test_request_key_is_canonical():
+    messages = [{"role": "user", "content": "Hello"}]
+    key = request_key("gpt-4", messages, 0, None)
+
+    assert key == request_key("gpt-4", [{"content": "Hello", "role": "user"}], 0, None)
+    assert key != request_key("gpt-4", messages, 0, 100)
+    assert key != request_key("gpt-3.5-turbo", messages, 0, None)
+
+
+def test_get_ignores_expired_responses(cache, mocker):
+    cache.put("key", "response")
+    mocker.patch("time.time", return_value=time.time() + 61)
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def mock_chat_completion(mocker):
+    return mocker.patch(
+        "openai.ChatCompletion.create",
+        return_value=OpenAIObject.construct_from(
+            {
+                "choices": [{"message": {"content": "reply"}}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1},
+            }
+        ),
+    )
+
+
+def test_create_chat_completion_uses_cache(
+    config, api_manager, mocker, mock_chat_completion
+):
+    mocker.patch.object(config, "response_cache_size", 10)
+    messages = [{"role": "user", "content": "Hello"}]
+
+    for _ in range(2):
+        reply = llm_utils.create_chat_completion(messages, model="gpt-4", temperature=0)
+        assert reply == "reply"
+
+    assert mock_chat_completion.call_count == 1
+    assert api_manager.get_response_cache_hits() == 1
+    assert api_manager.get_response_cache_misses() == 1
+
+
+def test_create_chat_completion_skips_cache_above_zero_temperature(
+    config, api_manager, mocker, mock_chat_completion
+):
+    mocker.patch.object(config, "response_cache_size", 10)
+    messages = [{"role": "user", "content": "Hello"}]
+
+    for _ in range(2):
+        llm_utils.create_chat_completion(messages, model="gpt-4", temperature=0.5)
+
+    assert mock_chat_completion.call_count == 2
+    assert api_manager.get_response_cache_misses() == 0
@@ -0,0 +1,150 @@
+import pytest
+from openai.error import APIError, RateLimitError
+from openai.openai_object import OpenAIObject
+
+from autogpt.llm import llm_utils
+from autogpt.llm.retry import Backoff, CircuitBreaker, CircuitOpenError, get_retry_after
+
+
+def test_backoff_delays_stay_within_bounds():
+    backoff = Backoff(base=1, cap=10, max_total_wait=1000)
+    previous = 1
+    for _ in range(20):
+        delay = backoff.next_delay()
+        assert 1 <= delay <= min(10, previous * 3)
+        previous = delay
+
+
+def test_backoff_stops_at_max_total_wait():
+    backoff = Backoff(base=1, cap=10, max_total_wait=25)
+    delays = []
+    while (delay := backoff.next_delay()) is not None:
+        delays.append(delay)
+
+    assert sum(delays) <= 25
+    assert backoff.total_wait == sum(delays)
+
+
+def test_backoff_uses_retry_after():
+    backoff = Backoff(base=1, cap=10, max_total_wait=100)
+
+    assert backoff.next_delay(retry_after=30) == 30
+    assert backoff.next_delay(retry_after=80) is None
+
+
+def test_get_retry_after():
+    assert get_retry_after(RateLimitError("Error", headers={"Retry-After": "7"})) == 7
+    assert (
+        get_retry_after(RateLimitError("Error", headers={"retry-after": "x"})) is None
+    )
+    assert get_retry_after(RateLimitError("Error")) is None
+
+
+def test_retry_openai_api_honors_retry_after(mocker):
+    sleep = mocker.patch("time.sleep")
+    error = RateLimitError("Error", headers={"Retry-After": "3"})
+    calls = []
+
+    @llm_utils.retry_openai_api(backoff_base=0.001, warn_user=False)
+    def f():
+        calls.append(1)
+        if len(calls) == 1:
+            raise error
+        return len(calls)
+
+    assert f() == 2
+    sleep.assert_called_once_with(3.0)
+
+
+def test_retry_openai_api_raises_after_max_total_wait(mocker):
+    mocker.patch("time.sleep")
+    error = APIError("Error", http_status=502, headers={"Retry-After": "40"})
+    calls = []
+
+    @llm_utils.retry_openai_api(max_total_wait=100)
+    def f():
+        calls.append(1)
+        raise error
+
+    with pytest.raises(APIError):
+        f()
+    assert len(calls) == 3
+
+
+def test_circuit_breaker_opens_and_half_opens(mocker):
+    monotonic = mocker.patch("time.monotonic", return_value=0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    monotonic.return_value = 11
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    monotonic.return_value = 22
+    breaker.record_success()
+    breaker.check()
+
+
+def test_retry_openai_api_stops_when_circuit_opens():
+    breaker = CircuitBreaker(failure_threshold=3)
+    error = APIError("Error", http_status=502)
+    calls = []
+
+    @llm_utils.retry_openai_api(backoff_base=0.001, circuit_breaker=breaker)
+    def f():
+        calls.append(1)
+        raise error
+
+    with pytest.raises(APIError):
+        f()
+    assert len(calls) == 3
+
+    with pytest.raises(CircuitOpenError):
+        f()
+    assert len(calls) == 3
+
+
+def _failing_stream(chunks):
+    for chunk in chunks:
+        yield OpenAIObject.construct_from({"choices": [{"delta": {"content": chunk}}]})
+    raise APIError("Error", http_status=502)
+
+
+def test_stream_is_not_retried_after_a_chunk_was_delivered(config, api_manager, mocker):
+    mocker.patch("time.sleep")
+    mock_create = mocker.patch(
+        "openai.ChatCompletion.create", side_effect=lambda **_: _failing_stream(["{"])
+    )
+    received = []
+
+    with pytest.raises(APIError):
+        llm_utils.create_chat_completion(
+            [{"role": "user", "content": "Hello"}], "gpt-4", on_chunk=received.append
+        )
+
+    assert mock_create.call_count == 1
+    assert received == ["{"]
+
+
+def test_stream_is_retried_before_any_chunk_was_delivered(config, api_manager, mocker):
+    mocker.patch("time.sleep")
+    mocker.patch("autogpt.llm.api_manager.count_message_tokens", return_value=1)
+    mocker.patch("autogpt.llm.api_manager.count_string_tokens", return_value=1)
+    streams = [_failing_stream([]), iter([])]
+    mock_create = mocker.patch(
+        "openai.ChatCompletion.create", side_effect=lambda **_: streams.pop(0)
+    )
+
+    reply = llm_utils.create_chat_completion(
+        [{"role": "user", "content": "Hello"}], "gpt-4", on_chunk=print
+    )
+
+    assert mock_create.call_count == 2
+    assert reply == ""
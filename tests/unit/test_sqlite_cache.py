@@ -0,0 +1,40 @@
+import pytest
+
+from autogpt.llm.sqlite_cache import SQLiteLRUCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SQLiteLRUCache(tmp_path / "cache.sqlite3", max_entries=2)
+    yield cache
+    cache.close()
+
+
+def test_put_evicts_least_recently_used(cache):
+    cache.put("first", "1")
+    cache.put("second", b"2")
+    cache.get("first")
+    cache.put("third", "3")
+
+    assert len(cache) == 2
+    assert cache.get("first") == "1"
+    assert cache.get("second") is None
+    assert cache.get("third") == "3"
+
+
+def test_get_deletes_expired_values(cache):
+    cache.put("key", "value")
+
+    assert cache.get("key", created_after=0) == "value"
+    assert cache.get("key", created_after=float("inf")) is None
+    assert len(cache) == 0
+
+
+def test_reopen_keeps_the_cache_of_the_same_path(cache, tmp_path):
+    assert SQLiteLRUCache.reopen(cache, cache.path, max_entries=5) is cache
+    assert cache.max_entries == 5
+
+    other = SQLiteLRUCache.reopen(cache, tmp_path / "other.sqlite3", max_entries=1)
+    assert other is not cache
+    assert other.max_entries == 1
+    other.close()
@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+import spacy
+
+from autogpt.processing import text
+
+
+@pytest.fixture
+def memory(mocker):
+    memory = mocker.MagicMock()
+    mocker.patch("autogpt.processing.text.get_memory", return_value=memory)
+    return memory
+
+
+def test_summarize_text_summarizes_chunks_concurrently(mocker, config, memory):
+    chunks = [f"chunk {i}" for i in range(6)]
+    mocker.patch.object(config, "browse_summary_workers", 2)
+    mocker.patch("autogpt.processing.text.split_text", return_value=iter(chunks))
+    mocker.patch("autogpt.processing.text.count_message_tokens", return_value=1)
+    mocker.patch("autogpt.processing.text.count_string_tokens", return_value=1)
+    running = []
+    max_running = 0
+
+    async def acreate_chat_completion(model, messages):
+        nonlocal max_running
+        content = messages[0]["content"]
+        running.append(content)
+        max_running = max(max_running, len(running))
+        # finish the first chunks last, the order of the summaries must not change
+        await asyncio.sleep(0.01 if "chunk 0" in content else 0)
+        running.remove(content)
+        return content.split('"""')[1].replace("chunk", "summary")
+
+    mock_acreate = mocker.patch(
+        "autogpt.processing.text.acreate_chat_completion",
+        side_effect=acreate_chat_completion,
+    )
+
+    summary = text.summarize_text("https://example.com", "Text", "What?")
+
+    assert max_running == 2
+    assert mock_acreate.call_count == len(chunks) + 1
+    combined = mock_acreate.call_args_list[-1].kwargs["messages"][0]["content"]
+    assert combined.split('"""')[1] == "\n".join(
+        f"summary {i}" for i in range(len(chunks))
+    )
+    assert summary == "\n".join(f"summary {i}" for i in range(len(chunks)))
+
+    raw_texts, summary_texts = (call.args[0] for call in memory.add_many.mock_calls)
+    assert raw_texts[1] == "Source: https://example.com\nRaw content part#2: chunk 1"
+    assert summary_texts[1] == (
+        "Source: https://example.com\nContent summary part#2: summary 1"
+    )
+
+
+@pytest.fixture
+def count_words(mocker):
+    # One token per word, and none for the request itself
+    mocker.patch("autogpt.processing.text.count_message_tokens", return_value=0)
+    mocker.patch(
+        "autogpt.processing.text.count_string_tokens",
+        side_effect=lambda string, model: len(string.split()),
+    )
+
+
+@pytest.fixture
+def spacy_load(mocker):
+    text.get_sentencizer.cache_clear()
+    yield mocker.patch("spacy.load", side_effect=lambda name: spacy.blank("en"))
+    text.get_sentencizer.cache_clear()
+
+
+def test_split_text_packs_sentences(count_words, spacy_load):
+    page = "One two. Three four five.\nSix. Seven eight nine ten."
+
+    # sentences take one more token for the space joining them
+    chunks = list(text.split_text(page, max_length=8, model="gpt-3.5-turbo"))
+
+    assert chunks == ["One two. Three four five.", "Six. Seven eight nine ten."]
+
+
+def test_split_text_loads_the_pipeline_once(count_words, spacy_load):
+    for _ in range(3):
+        list(text.split_text("One. Two.", max_length=8, model="gpt-3.5-turbo"))
+
+    spacy_load.assert_called_once()
+
+
+def test_split_text_rejects_long_sentences(count_words, spacy_load):
+    with pytest.raises(ValueError):
+        list(text.split_text("One. " * 3 + "a b c d e f g h.", max_length=8))
+
+
+def test_group_summaries(count_words):
+    summaries = ["a b", "c", "d e f", "g", "h i j"]
+
+    # summaries take one more token for the newline joining them
+    groups = text.group_summaries(summaries, "What?", "gpt-3.5-turbo", max_length=11)
+
+    assert groups == [["a b", "c", "d e f"], ["g", "h i j"]]
+
+
+def test_group_summaries_keeps_groups_within_max_length(count_words):
+    summaries = ["a b c d", "e f g h", "i j"]
+
+    groups = text.group_summaries(summaries, "What?", "gpt-3.5-turbo", max_length=11)
+
+    # the third summary does not fit with the first two
+    assert groups == [["a b c d", "e f g h"], ["i j"]]
+
+
+def test_group_summaries_truncates_long_summaries(count_words):
+    summaries = ["a b c d e f g"] * 5
+
+    groups = text.group_summaries(summaries, "What?", "gpt-3.5-turbo", max_length=11)
+
+    # truncated to half a request, any two of them fit together
+    assert groups == [["a b c d"] * 2, ["a b c d"] * 2, ["a b c d"]]
+
+
+def test_truncate_text(count_words):
+    assert text.truncate_text("a b c", 5, "gpt-3.5-turbo") == "a b c"
+    assert text.truncate_text("a b c d e", 2, "gpt-3.5-turbo") == "a b"
+
+
+def test_summarize_text_reduces_summaries_in_levels(
+    mocker, config, memory, count_words
+):
+    chunks = [f"chunk {i}" for i in range(8)]
+    mocker.patch.object(config, "browse_chunk_max_length", 11)
+    mocker.patch("autogpt.processing.text.split_text", return_value=iter(chunks))
+    requests = []
+
+    async def acreate_chat_completion(model, messages):
+        content = messages[0]["content"].split('"""')[1]
+        requests.append(content)
+        return "summary " + content.replace("\n", "+")
+
+    mocker.patch(
+        "autogpt.processing.text.acreate_chat_completion",
+        side_effect=acreate_chat_completion,
+    )
+
+    summary = text.summarize_text("https://example.com", "Text", "What?")
+
+    # 8 chunks, then 4 and 2 combined summaries, then the final summary
+    assert len(requests) == 8 + 4 + 2 + 1
+    assert requests[8] == "summary chunk 0\nsummary chunk 1"
+    # the combined summaries are truncated to fit in a request
+    assert all(len(request.split()) + request.count("\n") < 11 for request in requests)
+    assert requests[-1] == (
+        "summary summary summary chunk\nsummary summary summary chunk"
+    )
+    assert summary == "summary " + requests[-1].replace("\n", "+")
+
+
+def test_summarize_text_without_text():
+    assert text.summarize_text("https://example.com", "", "What?") == (
+        "Error: No text to summarize"
+    )
@@ -0,0 +1,154 @@
+import json
+import threading
+
+import pytest
+
+from autogpt.llm.message_history import MessageHistory
+from autogpt.memory_management import summary_memory
+from autogpt.memory_management.summary_memory import (
+    SummaryMemory,
+    format_events,
+    get_newly_trimmed_messages,
+)
+
+
+@pytest.fixture
+def agent(mocker):
+    return mocker.MagicMock()
+
+
+@pytest.fixture
+def mock_create_chat_completion(mocker):
+    # One token per word
+    mocker.patch.object(
+        summary_memory,
+        "count_string_tokens",
+        side_effect=lambda string, model: len(string.split()),
+    )
+    return mocker.patch.object(
+        summary_memory, "create_chat_completion", return_value="I did things."
+    )
+
+
+def test_format_events():
+    events = [
+        {"role": "user", "content": "Determine which next command to use"},
+        {"role": "user", "content": "Another user message"},
+        {
+            "role": "assistant",
+            "content": json.dumps({"thoughts": {}, "command": {"name": "a"}}),
+        },
+        {"role": "system", "content": "Command a returned: b"},
+    ]
+
+    assert format_events(events) == [
+        {"role": "you", "content": json.dumps({"command": {"name": "a"}})},
+        {"role": "your computer", "content": "Command a returned: b"},
+    ]
+    assert events[2]["role"] == "assistant"
+
+
+def test_update_skips_requests_without_new_events(agent, mock_create_chat_completion):
+    memory = SummaryMemory("I was created.", min_tokens=0)
+
+    assert not memory.update(agent, [])
+    assert not memory.update(agent, [{"role": "user", "content": "Hello"}])
+    mock_create_chat_completion.assert_not_called()
+    assert memory.message["content"].endswith("\nI was created.")
+
+
+def test_update_batches_events_until_min_tokens(agent, mock_create_chat_completion):
+    memory = SummaryMemory("I was created.", min_tokens=5)
+
+    assert not memory.update(agent, [{"role": "system", "content": "one two"}])
+    assert not memory.update(agent, [{"role": "system", "content": "three four"}])
+    mock_create_chat_completion.assert_not_called()
+
+    assert memory.update(agent, [{"role": "system", "content": "five"}])
+    mock_create_chat_completion.assert_called_once()
+    prompt = mock_create_chat_completion.call_args.args[0][0]["content"]
+    assert "one two" in prompt and "three four" in prompt and "five" in prompt
+    assert str(memory).endswith("\nI did things.")
+    assert memory.pending_events == []
+    assert memory.pending_tokens == 0
+
+
+def test_background_update_does_not_block(agent, mock_create_chat_completion):
+    finish = threading.Event()
+    mock_create_chat_completion.side_effect = lambda *_: finish.wait(5) and "Done."
+    memory = SummaryMemory("I was created.", min_tokens=1, background=True)
+
+    assert not memory.update(agent, [{"role": "system", "content": "one"}])
+    # the previous summary is used until the new one is done
+    assert not memory.update(agent, [{"role": "system", "content": "two"}])
+    assert str(memory).endswith("\nI was created.")
+    assert mock_create_chat_completion.call_count == 1
+
+    finish.set()
+    assert memory.wait()
+    assert str(memory).endswith("\nDone.")
+    # the events that arrived in the meantime are summarized next
+    assert memory.pending_events == [{"role": "your computer", "content": "two"}]
+
+
+def test_background_update_waits_after_max_staleness(
+    agent, mock_create_chat_completion
+):
+    finish = threading.Event()
+    mock_create_chat_completion.side_effect = lambda *_: finish.wait(5) and "Done."
+    memory = SummaryMemory(
+        "I was created.", min_tokens=1, background=True, max_staleness=1
+    )
+
+    memory.update(agent, [{"role": "system", "content": "one"}])
+    assert not memory.update(agent, [])
+
+    threading.Timer(0.05, finish.set).start()
+    assert memory.update(agent, [])
+    assert str(memory).endswith("\nDone.")
+
+
+def test_get_newly_trimmed_messages():
+    history = MessageHistory(
+        [{"role": "user", "content": str(i)} for i in range(6)], first_id=10
+    )
+
+    trimmed, trimmed_until_id = get_newly_trimmed_messages(history, 3, 10)
+    assert trimmed == history[:3]
+    assert trimmed_until_id == 13
+
+    # duplicates are told apart by their position
+    history.append(dict(history[-1]))
+    trimmed, trimmed_until_id = get_newly_trimmed_messages(history, 6, 13)
+    assert trimmed == history[3:6]
+    assert trimmed_until_id == 16
+
+    # the context grew back, nothing new was trimmed
+    trimmed, trimmed_until_id = get_newly_trimmed_messages(history, 4, 16)
+    assert trimmed == []
+    assert trimmed_until_id == 16
+
+
+def test_background_update_logs_in_the_cycle_it_was_sent_in(
+    agent, mock_create_chat_completion
+):
+    finish = threading.Event()
+    mock_create_chat_completion.side_effect = lambda *_: finish.wait(5) and "Done."
+    log_threads = []
+    agent.log_cycle_handler.log_cycle.side_effect = lambda *_: log_threads.append(
+        threading.current_thread()
+    )
+    memory = SummaryMemory("I was created.", min_tokens=1, background=True)
+
+    agent.cycle_count = 3
+    memory.update(agent, [{"role": "system", "content": "one"}])
+    agent.cycle_count = 4
+    finish.set()
+    assert memory.wait()
+
+    (prompt_call, summary_call) = agent.log_cycle_handler.log_cycle.call_args_list
+    assert prompt_call.args[2] == 3
+    assert prompt_call.args[4] == summary_memory.PROMPT_SUMMARY_FILE_NAME
+    assert summary_call.args[2:] == (3, "Done.", summary_memory.SUMMARY_FILE_NAME)
+    # the handler of the cycle logs is not shared with the worker thread
+    assert log_threads == [threading.current_thread()] * 2